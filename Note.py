@@ -1,9 +1,17 @@
 import librosa
 import mido
+import heapq
+import logging
+import struct
 from collections import defaultdict
 from mido import MidiFile, MidiTrack
 import numpy as np
 
+from Utils.log_utils import get_logger
+from midi_part.midi_writer import encode_variable_length, header_chunk
+
+logger = get_logger('Note')
+
 class NoteEvent:
     def __init__(self, note_name, isPiano, frequency, start_time, strength):
         self.note_name = note_name
@@ -14,6 +22,7 @@ class NoteEvent:
         self.max_strength = strength
         self.last_seen_time = start_time
         self.is_active = True
+        self.committed = False  # note_on already handed to the sinks (see NoteTracker._advance_sinks)
     
     def update(self, time, strength):
         """Update note with new detection"""
@@ -29,13 +38,53 @@ class NoteEvent:
         return f"{self.note_name}: {self.start_time:.2f}s - {self.end_time:.2f}s ({self.get_duration():.2f}s)"
 
 class NoteTracker:
-    def __init__(self, smoothing_time=0.25, min_duration=0.1, detection_threshold=0.3):
+    def __init__(self, smoothing_time=0.25, min_duration=0.1, detection_threshold=0.3, keep_completed=True):
         self.smoothing_time = smoothing_time
         self.min_duration = min_duration
         self.detection_threshold = detection_threshold
         self.active_notes = {}  # note_name -> NoteEvent
         self.completed_notes = []  # List of completed NoteEvent objects
         self.note_tolerance_hz = 5  # Hz tolerance for considering notes the same
+        self.keep_completed = keep_completed  # False = notes only go to the sinks
+        self.sinks = []  # Streaming consumers of completed notes (see StreamingMidiWriter)
+        self.completed_count = 0
+
+    def attach_sink(self, sink):
+        """Attach a sink that receives every note as soon as it completes"""
+        self.sinks.append(sink)
+
+    def _complete_note(self, note_event):
+        """Store a finished note and forward it to the attached sinks"""
+        self.completed_count += 1
+        if self.keep_completed:
+            self.completed_notes.append(note_event)
+        for sink in self.sinks:
+            sink.add_note(note_event)
+
+    def _advance_sinks(self, current_time):
+        """
+        Tell the sinks up to which time no new event can appear anymore.
+        An active note that lasted min_duration is sure to be kept: its note_on
+        is committed to the sinks right away, and only its note_off (at its last
+        detection, at most smoothing_time ago) is still to come. Other active
+        notes started at most smoothing_time + min_duration ago, and future notes
+        start at current_time (back-dated by at most 50ms). The watermark thus
+        stays within that window, however long a note is held.
+        """
+        if not self.sinks:
+            return
+        watermark = current_time - 0.05
+        for note_event in self.active_notes.values():
+            if not note_event.committed and note_event.get_duration() >= self.min_duration:
+                note_event.committed = True
+                for sink in self.sinks:
+                    sink.start_note(note_event)
+            if note_event.committed:
+                watermark = min(watermark, note_event.last_seen_time)
+            else:
+                watermark = min(watermark, note_event.start_time)
+        for sink in self.sinks:
+            sink.advance(watermark)
     
     def _get_note_key(self, note_name, frequency):
         """Create a key for tracking notes, allowing for slight frequency variations"""
@@ -69,7 +118,7 @@ class NoteTracker:
                     # Gap is too long, close this note
                     note_event.is_active = False
                     if note_event.get_duration() >= self.min_duration:
-                        self.completed_notes.append(note_event)
+                        self._complete_note(note_event)
                     notes_to_remove.append(key)
         
         # Remove notes that have ended
@@ -87,6 +136,8 @@ class NoteTracker:
                     adjusted_start_time = max(0, current_time - 0.05)  # Back-date by 50ms
                 
                 self.active_notes[key] = NoteEvent(note_name, isPiano, freq, adjusted_start_time, strength)
+
+        self._advance_sinks(current_time)
     
     def finalize(self, final_time):
         """Finalize all remaining active notes"""
@@ -94,7 +145,7 @@ class NoteTracker:
             note_event.end_time = final_time
             note_event.is_active = False
             if note_event.get_duration() >= self.min_duration:
-                self.completed_notes.append(note_event)
+                self._complete_note(note_event)
         self.active_notes.clear()
     
     def get_active_notes(self):
@@ -137,7 +188,7 @@ class NoteTracker:
                 all_notes.append(note_event)
         
         if not all_notes:
-            print("No notes to export to MIDI.")
+            logger.warning("No notes to export to MIDI.")
             return
         
         # Sort notes by start time
@@ -178,11 +229,12 @@ class NoteTracker:
                 midi_events.append((note_event.end_time, 'note_off', midi_note, velocity))
                 
             except Exception as e:
-                print(f"Warning: Could not convert note {note_event.note_name} at {note_event.frequency:.1f} Hz to MIDI: {e}")
+                logger.warning("Could not convert note %s at %.1f Hz to MIDI: %s",
+                               note_event.note_name, note_event.frequency, e)
                 continue
         
         if not midi_events:
-            print("No valid MIDI events to export.")
+            logger.warning("No valid MIDI events to export.")
             return
         
         # Sort events by time
@@ -208,45 +260,192 @@ class NoteTracker:
         # Save MIDI file
         try:
             mid.save(output_file)
-            print(f"\nMIDI file exported successfully: {output_file}")
-            print(f"  - {len(all_notes)} notes exported")
-            print(f"  - Tempo: {tempo_bpm} BPM")
-            print(f"  - Program: {program}")
-            print(f"  - Velocity range: {velocity_min}-{velocity_max}")
-            print(f"  - Duration: {max(note.end_time for note in all_notes):.2f} seconds")
+            logger.info("\nMIDI file exported successfully: %s", output_file)
+            logger.info("  - %s notes exported", len(all_notes))
+            logger.info("  - Tempo: %s BPM", tempo_bpm)
+            logger.info("  - Program: %s", program)
+            logger.info("  - Velocity range: %s-%s", velocity_min, velocity_max)
+            logger.info("  - Duration: %.2f seconds", max(note.end_time for note in all_notes))
         except Exception as e:
-            print(f"Error saving MIDI file: {e}")
+            logger.error("Error saving MIDI file: %s", e)
     
     def print_note_summary(self):
         """Print summary of all detected notes"""
-        print("\n" + "="*60)
-        print("NOTE TIMING SUMMARY")
-        print("="*60)
-        
+        logger.info("\n" + "="*60)
+        logger.info("NOTE TIMING SUMMARY")
+        logger.info("="*60)
+
+        if not self.keep_completed:
+            # Notes were streamed to the sinks and are not kept in memory
+            logger.info("Total notes detected: %s (streamed, no detailed list)", self.completed_count)
+            return
+
         all_notes = self.completed_notes + [n for n in self.active_notes.values() if not n.is_active]
         all_notes.sort(key=lambda x: x.start_time)
         
         if not all_notes:
-            print("No notes detected with sufficient duration.")
+            logger.info("No notes detected with sufficient duration.")
             return
         
-        print(f"Total notes detected: {len(all_notes)}")
-        print(f"Time range: {all_notes[0].start_time:.2f}s - {all_notes[-1].end_time:.2f}s")
-        print("\nDetailed note list:")
-        print("-" * 60)
+        logger.info("Total notes detected: %s", len(all_notes))
+        logger.info("Time range: %.2fs - %.2fs", all_notes[0].start_time, all_notes[-1].end_time)
+
+        # The per-note dump is only built when debug output is enabled (VERBOSE_LOGGING)
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+
+        logger.debug("\nDetailed note list:")
+        logger.debug("-" * 60)
         
         for i, note in enumerate(all_notes, 1):
-            print(f"{i:2d}. {note}")
+            logger.debug("%2d. %s", i, note)
         
         # Statistics by note name
         note_stats = defaultdict(list)
         for note in all_notes:
             note_stats[note.note_name].append(note.get_duration())
         
-        print("\nNote statistics:")
-        print("-" * 30)
+        logger.debug("\nNote statistics:")
+        logger.debug("-" * 30)
         for note_name, durations in sorted(note_stats.items()):
             avg_duration = np.mean(durations)
             total_duration = sum(durations)
             count = len(durations)
-            print(f"{note_name:>6s}: {count:2d} occurrences, avg {avg_duration:.2f}s, total {total_duration:.2f}s")
+            logger.debug("%6s: %2d occurrences, avg %.2fs, total %.2fs", note_name, count, avg_duration, total_duration)
+
+class StreamingMidiWriter:
+    """
+    MIDI sink for NoteTracker that writes notes to disk as soon as they complete,
+    so memory stays flat no matter how long the recording is.
+
+    Events go into a small reorder buffer (a heap of note_on/note_off events):
+    the note_on when the tracker commits a held note (start_note), the note_off
+    when it completes (add_note). The tracker advances a watermark every frame:
+    events older than it can no longer be preceded by a new note, so they are
+    written right away with their delta time. The buffer therefore only spans
+    the smoothing window, even while a note is sustained. The track length in
+    the header is patched when the writer is closed.
+
+    Unlike export_to_midi, the global strength range is not known in advance, so
+    velocities are scaled against a fixed strength range instead. A note committed
+    while still held gets the velocity of its strongest detection so far.
+    """
+    def __init__(self, output_file, tempo_bpm=120, velocity_min=64, velocity_max=127, program=0,
+                 strength_range=(0.12, 2.0), ticks_per_beat=480):
+        self.output_file = output_file
+        self.tempo_bpm = tempo_bpm
+        self.velocity_min = velocity_min
+        self.velocity_max = velocity_max
+        self.program = program
+        self.strength_min, self.strength_max = strength_range
+        self.ticks_per_second = ticks_per_beat * (tempo_bpm / 60.0)
+
+        self.pending = []  # heap of (time, seq, message_type, midi_note, velocity)
+        self.started = {}  # NoteEvent -> (midi_note, velocity) of the notes whose note_on is queued
+        self.seq = 0
+        self.last_tick = 0
+        self.note_count = 0
+        self.last_end_time = 0.0
+        self.closed = False
+
+        self.file = open(output_file, 'wb')
+        # Header chunk: type 1, one track
+        self.file.write(header_chunk(1, ticks_per_beat))
+        # Track chunk, its length is written in close()
+        self.file.write(b'MTrk')
+        self.length_offset = self.file.tell()
+        self.file.write(struct.pack('>I', 0))
+        self.track_start = self.file.tell()
+
+        self._write_message(0, mido.MetaMessage('set_tempo', tempo=mido.bpm2tempo(tempo_bpm)))
+        self._write_message(0, mido.Message('program_change', program=program))
+
+    def accepts(self, note_event):
+        """Same instrument split as export_to_midi"""
+        return (self.program == 0 and note_event.isPiano) or (self.program != 0 and not note_event.isPiano)
+
+    def start_note(self, note_event):
+        """Queue the note_on of a note that is still held, its note_off comes with add_note"""
+        if not self.accepts(note_event):
+            return
+        message = self._note_message(note_event)
+        if message is None:
+            return
+        midi_note, velocity = message
+        self.started[note_event] = message
+        heapq.heappush(self.pending, (note_event.start_time, self.seq, 'note_on', midi_note, velocity))
+        self.seq += 1
+
+    def add_note(self, note_event):
+        """Queue the note_off of a completed note, and its note_on if start_note did not"""
+        if not self.accepts(note_event):
+            return
+        message = self.started.pop(note_event, None)
+        if message is None:
+            message = self._note_message(note_event)
+            if message is None:
+                return
+            heapq.heappush(self.pending, (note_event.start_time, self.seq, 'note_on', *message))
+            self.seq += 1
+        midi_note, velocity = message
+        heapq.heappush(self.pending, (note_event.end_time, self.seq, 'note_off', midi_note, velocity))
+        self.seq += 1
+        self.note_count += 1
+        self.last_end_time = max(self.last_end_time, note_event.end_time)
+
+    def _note_message(self, note_event):
+        """(midi_note, velocity) of a note, None if its frequency has no MIDI note"""
+        try:
+            midi_note = int(round(librosa.hz_to_midi(note_event.frequency)))
+        except Exception as e:
+            logger.warning("Could not convert note %s at %.1f Hz to MIDI: %s",
+                           note_event.note_name, note_event.frequency, e)
+            return None
+        midi_note = max(0, min(127, midi_note))
+
+        strength_range = self.strength_max - self.strength_min
+        if strength_range > 0:
+            norm_strength = (note_event.max_strength - self.strength_min) / strength_range
+            norm_strength = max(0.0, min(1.0, norm_strength))
+        else:
+            norm_strength = 0.5
+        velocity = int(self.velocity_min + norm_strength * (self.velocity_max - self.velocity_min))
+        velocity = max(1, min(127, velocity))
+        return midi_note, velocity
+
+    def advance(self, watermark):
+        """Write every buffered event that happens before the watermark"""
+        while self.pending and self.pending[0][0] <= watermark:
+            self._write_event(heapq.heappop(self.pending))
+
+    def close(self):
+        """Flush the buffer, end the track and finalize the header"""
+        if self.closed:
+            return
+        while self.pending:
+            self._write_event(heapq.heappop(self.pending))
+        self._write_message(0, mido.MetaMessage('end_of_track'))
+
+        track_length = self.file.tell() - self.track_start
+        self.file.seek(self.length_offset)
+        self.file.write(struct.pack('>I', track_length))
+        self.file.close()
+        self.closed = True
+
+        logger.info("\nMIDI file streamed successfully: %s", self.output_file)
+        logger.info("  - %s notes exported", self.note_count)
+        logger.info("  - Tempo: %s BPM", self.tempo_bpm)
+        logger.info("  - Program: %s", self.program)
+        logger.info("  - Velocity range: %s-%s", self.velocity_min, self.velocity_max)
+        logger.info("  - Duration: %.2f seconds", self.last_end_time)
+
+    def _write_event(self, event):
+        event_time, _, event_type, midi_note, velocity = event
+        # Absolute ticks so rounding errors don't accumulate over long files
+        tick = max(self.last_tick, int(round(event_time * self.ticks_per_second)))
+        delta_ticks = tick - self.last_tick
+        self.last_tick = tick
+        self._write_message(delta_ticks, mido.Message(event_type, note=midi_note, velocity=velocity))
+
+    def _write_message(self, delta_ticks, message):
+        self.file.write(encode_variable_length(delta_ticks) + bytes(message.bytes()))
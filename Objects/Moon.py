@@ -3,6 +3,12 @@ import math
 from Objects.StellarObject import *
 from Utils.func_utils import *
 
+def moonLevels(n):
+    """Niveau de gris de chaque triangle selon le bruit n (mêmes paliers qu'avant, en masques NumPy)"""
+    return np.select([n < 0.4, n < 0.55, n < 0.7],
+                     [(40 + 40 * n).astype(np.int64), (80 + 50 * n).astype(np.int64), (150 + 50 * n).astype(np.int64)],
+                     (200 + 55 * n).astype(np.int64))
+
 class Moon(StellarObject):
     def __init__(self, spacing, earth_x, earth_y, orbit_radius, moon_radius=120, collide_earth_ms=60000):
         super().__init__([], earth_x - orbit_radius, earth_y)
@@ -21,36 +27,22 @@ class Moon(StellarObject):
         # Explosion state
         self.is_exploding = False
         self.explosion_started = False
-        self.explosion_triangles = []
 
-        self.regenerate_triangles()
+        self.buildMesh()
+        self.initNoiseTexture(self.rows, 2 * self.cols, collide_earth_ms, scale=0.04)
 
     def trigger_explosion(self):
         if self.explosion_started:
             return
         self.is_exploding = True
         self.explosion_started = True
-        self.explosion_triangles = []
-
-        for row in self.triangles:
-            for tri in row:
-                cx = (tri.p1[0] + tri.p2[0] + tri.p3[0]) / 3
-                cy = (tri.p1[1] + tri.p2[1] + tri.p3[1]) / 3
-                dx = cx - self.center_x
-                dy = cy - self.center_y
-                dist = math.sqrt(dx * dx + dy * dy) or 1
 
-                speed = random.uniform(20, 30)  # un peu plus lent que la Terre
-                vx = dx / dist * speed + random.uniform(-1, 1)
-                vy = dy / dist * speed + random.uniform(-1, 1)
+        # Les triangles partent de la position et des couleurs de la dernière frame
+        self.mesh = TriangleMesh(self.mesh.vertices + np.float32((self.center_x, self.center_y)), self.mesh.colors)
+        self.mesh.explode(self.center_x, self.center_y, 20, 30)  # un peu plus lent que la Terre
 
-                self.explosion_triangles.append({
-                    "triangle": tri,
-                    "vx": vx,
-                    "vy": vy,
-                })
-
-    def update(self, elapsed_time_ms):
+    def update(self, elapsed_time_ms, colors=True):
+        """colors=False avance seulement l'orbite et le bruit (frame non dessinée)"""
         if not self.is_exploding:
             # comportement normal (orbite + couleur)
             e_m_distance = 650
@@ -59,73 +51,44 @@ class Moon(StellarObject):
             self.angle += self.angular_speed
             self.center_x = self.earth_x + math.cos(self.angle) * self.distance
             self.center_y = self.earth_y + math.sin(self.angle) * self.distance
-            self.regenerate_triangles()
-            
             self.randomOffset -= 1
-
-            for y in range(len(self.triangles)):
-                for x in range(len(self.triangles[y])):
-                    n = self.noiseValue(x, y, scale=0.04)
-                    if n < 0.4:
-                        color = (int(40 + 40 * n),) * 3
-                    elif n < 0.55:
-                        color = (int(80 + 50 * n),) * 3
-                    elif n < 0.7:
-                        color = (int(150 + 50 * n),) * 3
-                    else:
-                        color = (int(200 + 55 * n),) * 3
-                    self.triangles[y][x].chooseColor(color)
+            if not colors:
+                return
+            self.mesh.setColors(np.repeat(moonLevels(self.noiseGrid())[..., None], 3, axis=-1))
         else:
             # explosion
-            for data in self.explosion_triangles:
-                tri = data["triangle"]
-                tri.p1[0] += data["vx"]
-                tri.p1[1] += data["vy"]
-                tri.p2[0] += data["vx"]
-                tri.p2[1] += data["vy"]
-                tri.p3[0] += data["vx"]
-                tri.p3[1] += data["vy"]
-
-                data["vx"] *= 1.02
-                data["vy"] *= 1.02
-
-                r, g, b = tri.color
-                tri.chooseColor((max(0, r - 4), max(0, g - 4), max(0, b - 4)))
+            self.mesh.step(1.02, 4)
 
     def draw(self, surface):
         if not self.is_exploding:
-            super().draw(surface)
+            self.drawSprite(surface)
         else:
-            for data in self.explosion_triangles:
-                tri = data["triangle"]
-                pygame.draw.polygon(surface, tri.color, (tri.p1, tri.p2, tri.p3))
-    
-    def regenerate_triangles(self):
-        triangleList = []
-        for y in range(self.rows):
-            tempList = []
-            for x in range(self.cols):
-                # Grille locale centrée sur la lune
-                x0 = x * self.spacing - self.moon_radius
-                x1 = (x + 1) * self.spacing - self.moon_radius
-                y0 = y * self.spacing - self.moon_radius
-                y1 = (y + 1) * self.spacing - self.moon_radius
+            self.mesh.draw(surface)
+
+    def buildMesh(self):
+        """
+        Maillage de la grille en coordonnées locales (centrées sur la lune), calculé une
+        fois : deux triangles par case dans l'ordre des lignes, sommets ramenés sur
+        le cercle. L'orbite ne fait que translater la lune, le sprite est dessiné une fois.
+        """
+        r = self.moon_radius
+        xs = np.arange(self.cols + 1) * self.spacing - r
+        ys = np.arange(self.rows + 1) * self.spacing - r
+        corners = np.stack(np.meshgrid(xs, ys), axis=-1).astype(np.float64)
+        dist2 = corners[..., 0] ** 2 + corners[..., 1] ** 2
+        outside = dist2 > r * r
+        corners[outside] = corners[outside] / np.sqrt(dist2[outside])[:, None] * r
 
-                def clamp(px, py):
-                    dx, dy = px, py
-                    dist2 = dx * dx + dy * dy
-                    if dist2 > self.moon_radius * self.moon_radius:
-                        dist = math.sqrt(dist2)
-                        dx = dx / dist * self.moon_radius
-                        dy = dy / dist * self.moon_radius
-                    return (dx + self.center_x, dy + self.center_y)
+        p0, p1 = corners[:-1, :-1], corners[:-1, 1:]
+        p2, p3 = corners[1:, :-1], corners[1:, 1:]
+        vertices = np.stack([np.stack([p0, p1, p2], axis=2), np.stack([p1, p3, p2], axis=2)], axis=2)
+        self.mesh = TriangleMesh(vertices.reshape(-1, 3, 2))
 
-                p0 = clamp(x0, y0)
-                p1 = clamp(x1, y0)
-                p2 = clamp(x0, y1)
-                p3 = clamp(x1, y1)
+        self.sprite_origin = int(math.ceil(r)) + 1  # Pixel du sprite où se trouve le centre de la lune
+        self.sprite_size = 2 * self.sprite_origin + 1
 
-                tempList.append(StellarObjectTriangle(p0, p1, p2))
-                tempList.append(StellarObjectTriangle(p1, p3, p2))
-            triangleList.append(tempList)
-        self.triangles = triangleList
\ No newline at end of file
+    def drawSprite(self, surface):
+        """Blit du sprite à la position de l'orbite (mis en cache par le maillage, recolorié si le bruit a changé)"""
+        sprite = self.mesh.sprite((self.sprite_size, self.sprite_size), (self.sprite_origin, self.sprite_origin))
+        surface.blit(sprite, (math.floor(self.center_x) - self.sprite_origin,
+                              math.floor(self.center_y) - self.sprite_origin))
@@ -41,6 +41,93 @@ class ExplosionFragment:
             points.append((px, py))
         pygame.draw.polygon(surface, self.color, points)
 
+def star_polygons(x, y, num_triangle, size, rotation):
+    """
+    Polygones d'une étoile : le corps central (num_triangle côtés)
+    puis un triangle sur chaque arête.
+    """
+    step = 2 * math.pi / num_triangle
+
+    polygon_points = []
+    for i in range(num_triangle):
+        angle = i * step + rotation
+        px = x + math.cos(angle) * size / 2
+        py = y + math.sin(angle) * size / 2
+        polygon_points.append((px, py))
+    polygons = [polygon_points]
+
+    # triangles extérieurs
+    for i in range(num_triangle):
+        p1 = polygon_points[i]
+        p2 = polygon_points[(i + 1) % num_triangle]
+
+        # milieu de l’arête
+        mx = (p1[0] + p2[0]) / 2
+        my = (p1[1] + p2[1]) / 2
+
+        # vecteur de l'arête
+        vx = p2[0] - p1[0]
+        vy = p2[1] - p1[1]
+
+        # vecteur perpendiculaire
+        nx, ny = -vy, vx
+        length = math.hypot(nx, ny)
+        if length == 0:
+            continue
+        nx /= length
+        ny /= length
+
+        # vecteur centre → milieu
+        cx = mx - x
+        cy = my - y
+
+        # vérifier si la normale pointe vers l’extérieur
+        dot = nx * cx + ny * cy
+        if dot < 0:
+            nx, ny = -nx, -ny
+
+        # sommet extérieur du triangle
+        tip = (mx + nx * size, my + ny * size)
+        polygons.append([p1, p2, tip])
+    return polygons
+
+def draw_star_shape(surface, color, x, y, num_triangle, size, rotation):
+    for polygon in star_polygons(x, y, num_triangle, size, rotation):
+        pygame.draw.polygon(surface, color, polygon)
+
+def star_extent(size):
+    """Distance max au centre d'un point de l'étoile (pointe des triangles extérieurs)"""
+    return 1.5 * size
+
+def trail_polygons(x, y, size, move_angle):
+    """Triangles (points, couleur) de la trainée d'une étoile qui se déplace selon move_angle"""
+    back_angle = move_angle + math.pi
+
+    num_trail_triangles = 10  # nombre de triangles dans la trainée
+    polygons = []
+    for i in range(num_trail_triangles):
+        # plus i est grand → plus le triangle est petit et éloigné
+        trail_size = size * (1.2 - i * 0.15)
+        distance = size * (1.5 + i * 1.0)
+
+        # points du triangle derrière
+        p1 = (x + math.cos(back_angle) * distance,
+              y + math.sin(back_angle) * distance)
+        p2 = (x + math.cos(back_angle + 0.3) * (trail_size * 0.7),
+              y + math.sin(back_angle + 0.3) * (trail_size * 0.7))
+        p3 = (x + math.cos(back_angle - 0.3) * (trail_size * 0.7),
+              y + math.sin(back_angle - 0.3) * (trail_size * 0.7))
+
+        # couleur qui s’assombrit avec la distance
+        fade = max(0, 255 - i * 40)
+        color = (255, fade, 120)  # du orange vers rouge sombre
+        polygons.append(([p1, p2, p3], color))
+    return polygons
+
+def draw_star_trail(surface, x, y, size, move_angle):
+    for points, color in trail_polygons(x, y, size, move_angle):
+        pygame.draw.polygon(surface, color, points)
+
 class Star():
     def __init__(self, x, y, num_triangle, size, color=(255, 255, 255)):
         self.x = x
@@ -66,56 +153,7 @@ class Star():
                 frag.draw(surface) 
             return
         
-        step = 2 * math.pi / self.num_triangle
-
-        polygon_points = []
-        for i in range(self.num_triangle):
-            angle = i * step + self.rotation
-            px = self.x + math.cos(angle) * self.size / 2
-            py = self.y + math.sin(angle) * self.size / 2
-            polygon_points.append((px, py))
-
-        # dessiner le corps
-        pygame.draw.polygon(surface, self.color, polygon_points)
-
-        # triangles extérieurs
-        for i in range(self.num_triangle):
-            p1 = polygon_points[i]
-            p2 = polygon_points[(i + 1) % self.num_triangle]
-
-            # milieu de l’arête
-            mx = (p1[0] + p2[0]) / 2
-            my = (p1[1] + p2[1]) / 2
-
-            # vecteur de l'arête
-            vx = p2[0] - p1[0]
-            vy = p2[1] - p1[1]
-
-            # vecteur perpendiculaire
-            nx, ny = -vy, vx
-            length = math.hypot(nx, ny)
-            if length == 0:
-                continue
-            nx /= length
-            ny /= length
-
-            # vecteur centre → milieu
-            cx = mx - self.x
-            cy = my - self.y
-
-            # vérifier si la normale pointe vers l’extérieur
-            dot = nx * cx + ny * cy
-            if dot < 0:
-                nx, ny = -nx, -ny
-
-            # sommet extérieur du triangle
-            tip = (mx + nx * self.size, my + ny * self.size)
-
-            # dessiner le triangle
-            pygame.draw.polygon(surface, self.color, [p1, p2, tip])
-        
-        
-
+        draw_star_shape(surface, self.color, self.x, self.y, self.num_triangle, self.size, self.rotation)
 
     def update(self, surface):
         match self.state:
@@ -149,29 +187,8 @@ class Star():
 
 
     def draw_trail(self, surface):
-        back_angle = self.move_angle + math.pi  
-
-        num_trail_triangles = 10  # nombre de triangles dans la trainée
-            
-        for i in range(num_trail_triangles):
-            # plus i est grand → plus le triangle est petit et éloigné
-            size = self.size * (1.2 - i * 0.15)  
-            distance = self.size * (1.5 + i * 1.0)
-
-            # points du triangle derrière
-            p1 = (self.x + math.cos(back_angle) * distance,
-                  self.y + math.sin(back_angle) * distance)
-            p2 = (self.x + math.cos(back_angle + 0.3) * (size * 0.7),
-                  self.y + math.sin(back_angle + 0.3) * (size * 0.7))
-            p3 = (self.x + math.cos(back_angle - 0.3) * (size * 0.7),
-                  self.y + math.sin(back_angle - 0.3) * (size * 0.7))
-
-            # couleur qui s’assombrit avec la distance
-            fade = max(0, 255 - i * 40)
-            color = (255, fade, 120)  # du orange vers rouge sombre
-            
-            pygame.draw.polygon(surface, color, [p1, p2, p3])
-            
+        draw_star_trail(surface, self.x, self.y, self.size, self.move_angle)
+
     def is_off_screen(self, width, height):
         return (self.x < -self.size or self.x > width + self.size or
                 self.y < -self.size or self.y > height + self.size)
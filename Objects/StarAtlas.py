@@ -0,0 +1,94 @@
+#       Classes
+import math
+import pygame
+
+from config import STAR_ROTATION_STEPS, STAR_TRAIL_STEPS, STAR_ATLAS_MAX_MB
+from Objects.Star import star_polygons, trail_polygons
+from Utils.log_utils import get_logger
+
+logger = get_logger('StarAtlas')
+
+ATLAS_COLORKEY = (255, 0, 255)  # Pixels transparents des sprites, ni une étoile ni une trainée
+
+def sprite_box(polygons):
+    """(left, top, width, height) en pixels entiers des polygones [(points, couleur)] centrés sur (0, 0)"""
+    xs = [p[0] for points, _ in polygons for p in points]
+    ys = [p[1] for points, _ in polygons for p in points]
+    left, top = math.floor(min(xs)), math.floor(min(ys))
+    return left, top, math.ceil(max(xs)) - left + 2, math.ceil(max(ys)) - top + 2
+
+def render_sprite(polygons):
+    """Sprite (colorkey) des polygones et décalage de son coin par rapport au centre"""
+    left, top, width, height = sprite_box(polygons)
+    sprite = pygame.Surface((width, height), 0, 32)
+    sprite.fill(ATLAS_COLORKEY)
+    sprite.set_colorkey(ATLAS_COLORKEY)
+    for points, color in polygons:
+        pygame.draw.polygon(sprite, color, [(x - left, y - top) for x, y in points])
+    return sprite, (left, top)
+
+class StarAtlas:
+    """
+    Sprites des étoiles dessinés une fois au démarrage : pour chaque (num_triangle, size,
+    couleur), des rotations quantifiées sur une période de symétrie (2π / num_triangle),
+    et pour chaque taille, la trainée à des angles de déplacement quantifiés.
+    Dessiner une étoile ou sa trainée = un blit. Si l'atlas dépasse max_bytes, le
+    nombre de rotations et d'angles est divisé par deux jusqu'à ce qu'il tienne
+    (avertissement s'il dépasse encore avec un seul sprite par étoile et par taille).
+    """
+    def __init__(self, star_types, sizes, rotation_steps=STAR_ROTATION_STEPS, trail_steps=STAR_TRAIL_STEPS,
+                 max_bytes=STAR_ATLAS_MAX_MB * 2**20):
+        star_types = sorted(set(star_types))
+        sizes = sorted(set(sizes))
+        while True:
+            self.rotation_steps = rotation_steps
+            self.trail_steps = trail_steps
+            self.nbytes = self.estimate(star_types, sizes)
+            if self.nbytes <= max_bytes or (rotation_steps == 1 and trail_steps == 1):
+                break
+            rotation_steps = max(1, rotation_steps // 2)
+            trail_steps = max(1, trail_steps // 2)
+        if self.nbytes > max_bytes:
+            logger.warning("Star atlas needs %.1f MB with one frame per sprite, above STAR_ATLAS_MAX_MB (%.1f MB)",
+                           self.nbytes / 2**20, max_bytes / 2**20)
+
+        self.stars = {(n, size, color): [render_sprite(self.star_frame_polygons(n, size, color, frame))
+                                         for frame in range(self.frames(n))]
+                      for n, size, color in star_types}
+        self.trails = {size: [render_sprite(self.trail_frame_polygons(size, frame)) for frame in range(self.trail_steps)]
+                       for size in sizes}
+
+    def frames(self, num_triangle):
+        """Rotations dessinées sur une période de symétrie de l'étoile"""
+        return max(1, round(self.rotation_steps / num_triangle))
+
+    def star_frame_polygons(self, n, size, color, frame):
+        rotation = frame * (2 * math.pi / n) / self.frames(n)
+        return [(points, color) for points in star_polygons(0, 0, n, size, rotation)]
+
+    def trail_frame_polygons(self, size, frame):
+        return trail_polygons(0, 0, size, frame * 2 * math.pi / self.trail_steps)
+
+    def estimate(self, star_types, sizes):
+        """Octets des sprites (32 bits par pixel) avec les rotation_steps / trail_steps actuels"""
+        nbytes = 0
+        for n, size, color in star_types:
+            for frame in range(self.frames(n)):
+                _, _, width, height = sprite_box(self.star_frame_polygons(n, size, color, frame))
+                nbytes += width * height * 4
+        for size in sizes:
+            for frame in range(self.trail_steps):
+                _, _, width, height = sprite_box(self.trail_frame_polygons(size, frame))
+                nbytes += width * height * 4
+        return nbytes
+
+    def blit_star(self, surface, n, size, color, x, y, rotation):
+        period = 2 * math.pi / n
+        frames = self.frames(n)
+        sprite, (left, top) = self.stars[(n, size, color)][round((rotation % period) / period * frames) % frames]
+        surface.blit(sprite, (math.floor(x) + left, math.floor(y) + top))
+
+    def blit_trail(self, surface, size, x, y, move_angle):
+        frame = round((move_angle % (2 * math.pi)) / (2 * math.pi) * self.trail_steps) % self.trail_steps
+        sprite, (left, top) = self.trails[size][frame]
+        surface.blit(sprite, (math.floor(x) + left, math.floor(y) + top))
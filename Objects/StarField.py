@@ -0,0 +1,158 @@
+#       Classes
+import bisect
+import math
+import random
+import numpy as np
+import pygame
+
+from config import STAR_ROTATION_STEPS
+from Objects.Star import StarState, ExplosionFragment, star_extent
+from Objects.StarAtlas import StarAtlas
+
+LAYER_COLORKEY = (255, 0, 255)  # Pixels transparents de la couche statique, jamais une couleur d'étoile
+
+STATIC_ROTATION_SPEED = 0.02
+MOVING_ROTATION_SPEED = 0.1
+
+class StarField:
+    """
+    Toutes les étoiles du fond en tableaux (position, taille, état, rotation...).
+    Les étoiles statiques tournent toutes ensemble (même rotation depuis le début) :
+    elles sont dessinées dans une couche mise en cache, refaite quand la rotation
+    quantifiée (STAR_ROTATION_STEPS par tour) change, et effacée localement quand une
+    étoile la quitte. Seules les étoiles en mouvement ou qui explosent sont dessinées une à une.
+    Chaque étoile et chaque trainée est un blit d'un sprite de l'atlas (StarAtlas).
+    """
+    def __init__(self, xs, ys, num_triangles, sizes, colors, width, height):
+        self.x = np.asarray(xs, dtype=np.float64)
+        self.y = np.asarray(ys, dtype=np.float64)
+        self.num_triangle = np.asarray(num_triangles, dtype=np.int64)
+        self.size = np.asarray(sizes, dtype=np.int64)
+        self.color = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+        self.colors = [tuple(color) for color in self.color.tolist()]
+        self.state = np.full(len(self.x), StarState.STATIC.value, dtype=np.int8)  # 0 : étoile disparue
+        self.rotation = np.zeros(len(self.x))
+        self.move_angle = np.zeros(len(self.x))
+        self.width = width
+        self.height = height
+
+        self.static_rotation = 0.0          # Rotation commune des étoiles statiques
+        self.free = list(range(len(self.x)))  # Indices des étoiles statiques, triés
+        self.active = []                      # Indices des étoiles en mouvement / qui explosent, triés
+        self.fragments = {}                   # Indice -> fragments de l'explosion
+
+        self.layer = None
+        self.layer_step = None                # Rotation quantifiée dessinée dans la couche
+        self.layer_dirty = []                 # Zones des étoiles parties depuis
+
+        # Sprites de toutes les étoiles du champ, dessinés une fois
+        self.atlas = StarAtlas(zip(self.num_triangle.tolist(), self.size.tolist(), self.colors), self.size.tolist())
+
+    def __len__(self):
+        return len(self.free) + len(self.active)
+
+    def pick_static(self):
+        """Indice d'une étoile statique au hasard (retirée de la liste), None s'il n'en reste plus"""
+        if not self.free:
+            return None
+        return self.free.pop(random.randrange(len(self.free)))
+
+    def launch(self, state):
+        """Une étoile statique au hasard passe à state (MOVING ou EXPLODING) dans une direction au hasard"""
+        i = self.pick_static()
+        if i is None:
+            return None
+        self.state[i] = state.value
+        self.rotation[i] = self.static_rotation
+        self.move_angle[i] = random.uniform(0, 2 * math.pi)
+        bisect.insort(self.active, i)
+        self.layer_dirty.append(self.star_rect(i))
+        return i
+
+    def star_rect(self, i):
+        extent = math.ceil(star_extent(self.size[i])) + 2
+        return pygame.Rect(int(self.x[i]) - extent, int(self.y[i]) - extent, 2 * extent + 1, 2 * extent + 1)
+
+    def layer_rotation(self):
+        step = round(self.static_rotation / (2 * math.pi) * STAR_ROTATION_STEPS) % STAR_ROTATION_STEPS
+        return step, step * 2 * math.pi / STAR_ROTATION_STEPS
+
+    def draw_static(self, indices, rotation):
+        for i in indices:
+            self.blit_star(self.layer, i, rotation)
+
+    def blit_star(self, surface, i, rotation):
+        self.atlas.blit_star(surface, int(self.num_triangle[i]), int(self.size[i]), self.colors[i],
+                             self.x[i], self.y[i], rotation)
+
+    def draw_layer(self, surface):
+        """Blit de la couche des étoiles statiques, refaite ou réparée si besoin"""
+        if self.layer is None:
+            self.layer = pygame.Surface((self.width, self.height), 0, 32)
+            self.layer.set_colorkey(LAYER_COLORKEY)
+        step, rotation = self.layer_rotation()
+        if step != self.layer_step:
+            self.layer.fill(LAYER_COLORKEY)
+            self.draw_static(self.free, rotation)
+            self.layer_step = step
+        elif self.layer_dirty:
+            static = self.state == StarState.STATIC.value
+            extent = np.ceil(star_extent(self.size)) + 2
+            for rect in self.layer_dirty:
+                # Étoiles statiques qui touchent la zone, redessinées dans la zone seulement
+                near = static & (self.x + extent >= rect.left) & (self.x - extent < rect.right) \
+                       & (self.y + extent >= rect.top) & (self.y - extent < rect.bottom)
+                self.layer.set_clip(rect)
+                self.layer.fill(LAYER_COLORKEY)
+                self.draw_static(np.flatnonzero(near).tolist(), rotation)
+            self.layer.set_clip(None)
+        self.layer_dirty = []
+        surface.blit(self.layer, (0, 0))
+
+    def update(self, surface, render=True):
+        """
+        Une frame : couche statique, puis chaque étoile active dans l'ordre des indices
+        (trainée, déplacement, corps ou fragments). render=False ne dessine rien.
+        """
+        if render:
+            self.draw_layer(surface)
+
+        for i in list(self.active):
+            if self.state[i] == StarState.MOVING.value:
+                if render:
+                    self.atlas.blit_trail(surface, int(self.size[i]), self.x[i], self.y[i], self.move_angle[i])
+                self.move_angle[i] += 0.01  # courbure
+                self.x[i] += math.cos(self.move_angle[i]) * 10
+                self.y[i] += math.sin(self.move_angle[i]) * 10
+                if render:
+                    self.blit_star(surface, i, self.rotation[i])
+                self.rotation[i] += MOVING_ROTATION_SPEED
+                if self.is_off_screen(i):
+                    self.remove(i)
+            else:
+                fragments = self.fragments.get(i)
+                if fragments is None:
+                    fragments = [ExplosionFragment(self.x[i], self.y[i]) for _ in range(40)]
+                for frag in fragments:
+                    frag.update()
+                # Si tous les fragments sont morts → l’étoile n’existe plus
+                fragments = [f for f in fragments if f.life > 0]
+                if not fragments:
+                    self.fragments.pop(i, None)
+                    self.remove(i)
+                    continue
+                self.fragments[i] = fragments
+                if render:
+                    for frag in fragments:
+                        frag.draw(surface)
+
+        self.static_rotation += STATIC_ROTATION_SPEED
+
+    def is_off_screen(self, i):
+        size = self.size[i]
+        return (self.x[i] < -size or self.x[i] > self.width + size or
+                self.y[i] < -size or self.y[i] > self.height + size)
+
+    def remove(self, i):
+        self.state[i] = 0
+        self.active.remove(i)
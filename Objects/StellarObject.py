@@ -1,6 +1,10 @@
+import math
 import random
 import noise
-import pygame
+import numpy as np
+
+from config import FPS
+from Objects.TriangleMesh import *
 
 class StellarObjectTriangle:
     def __init__(self, p1: tuple, p2: tuple, p3: tuple):
@@ -21,6 +25,7 @@ class StellarObjectTriangle:
 class StellarObject:
     def __init__(self, triangles, center_x, center_y):
         self.triangles = triangles
+        self.mesh = TriangleMesh.fromTriangles(triangles)
         self.randomOffset = random.randint(1,1000)
         self.center_x = center_x
         self.center_y = center_y
@@ -29,9 +34,36 @@ class StellarObject:
         val = noise.pnoise2((x + self.randomOffset) * scale, (y + self.randomOffset) * scale, octaves)
         return (val + 1)/2
 
+    def initNoiseTexture(self, rows, cols, duration_ms, scale = 0.1, octaves = 4):
+        """
+        noiseValue over a rows x cols grid only scrolls diagonally (randomOffset - 1
+        per frame): the values of the whole duration are sampled once, by (y + offset, x - y).
+        One extra second of frames covers a frame rate above FPS.
+        """
+        frames = math.ceil(duration_ms / 1000 * FPS) + FPS
+        self.noise_scale = scale
+        self.noise_octaves = octaves
+        self.noise_first_t = self.randomOffset - frames
+        self.noise_texture = np.array([[(noise.pnoise2((d + t) * scale, t * scale, octaves) + 1) / 2
+                                        for d in range(-(rows - 1), cols)]
+                                       for t in range(self.noise_first_t, self.randomOffset + rows)])
+        ys, xs = np.mgrid[0:rows, 0:cols]
+        self.noise_rows = ys
+        self.noise_diagonals = xs - ys + rows - 1
+
+    def noiseGrid(self):
+        """noiseValue(x, y) of the whole grid at the current randomOffset, as a (rows, cols) array"""
+        start = self.randomOffset - self.noise_first_t
+        if start < 0:
+            # Past the sampled duration
+            rows, cols = self.noise_rows.shape
+            return np.array([[self.noiseValue(x, y, self.noise_scale, self.noise_octaves) for x in range(cols)]
+                             for y in range(rows)])
+        return self.noise_texture[self.noise_rows + start, self.noise_diagonals]
+
+    def noiseField(self):
+        """noiseGrid as a list of rows"""
+        return self.noiseGrid().tolist()
+
     def draw(self, surface):
-        # Drawing all the triangles
-        for i in self.triangles:
-            for j in range(len(i)):
-                pygame.draw.polygon(surface, i[j].color, (i[j].p1, i[j].p2, i[j].p3))
-                pygame.draw.polygon(surface, i[j].color, (i[j].p1, i[j].p2, i[j].p3))
\ No newline at end of file
+        self.mesh.draw(surface)
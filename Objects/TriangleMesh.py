@@ -0,0 +1,108 @@
+#       Classes
+import random
+import numpy as np
+import pygame
+
+SPRITE_COLORKEY = (255, 0, 255)  # Pixels transparents des sprites, jamais dans les palettes de la Terre et de la Lune
+
+class TriangleMesh:
+    """
+    Triangles stockés en tableaux : vertices (N, 3, 2) float32, colors (N, 3) uint8.
+    Géométrie fixe : sprite() rastérise une fois la carte des triangles puis la recolorie
+    en un seul passage (pixels2d) quand les couleurs changent.
+    Géométrie qui bouge (explosion) : draw() trace un polygone par triangle visible.
+    """
+    def __init__(self, vertices, colors=None):
+        self.vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 3, 2)
+        self.colors = np.zeros((len(self.vertices), 3), dtype=np.uint8)
+        if colors is not None:
+            self.setColors(colors)
+        self.velocities = None      # (N, 2) après explode()
+        self.sprite_surface = None
+        self.sprite_key = None      # (size, offset) de la carte rastérisée
+        self.sprite_ids = None      # Indice du triangle (+1) de chaque pixel, 0 = aucun
+        self.sprite_colors = None   # Couleurs dessinées dans le sprite
+
+    @classmethod
+    def fromTriangles(cls, triangles):
+        """Maillage de lignes de StellarObjectTriangle (générateurs), dans l'ordre des lignes"""
+        flat = [tri for row in triangles for tri in row]
+        return cls([(tri.p1, tri.p2, tri.p3) for tri in flat], [tri.color for tri in flat])
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def setColors(self, colors):
+        """colors : (..., 3) dans l'ordre des triangles"""
+        self.colors = np.clip(np.asarray(colors).reshape(-1, 3), 0, 255).astype(np.uint8)
+
+    def top(self):
+        return float(self.vertices[..., 1].min()) if len(self) else 0.0
+
+    def rasterizeIds(self, size, offset=(0, 0)):
+        """
+        (width, height) de l'indice + 1 du triangle de chaque pixel : chaque triangle est
+        tracé une fois avec pygame.draw.polygon, dans l'ordre, l'indice servant de couleur
+        (mêmes pixels et mêmes recouvrements qu'en les dessinant un par un).
+        """
+        ids = pygame.Surface(size, 0, 32)
+        ids.fill((0, 0, 0))
+        for index, points in enumerate((self.vertices + np.float32(offset)).tolist(), 1):
+            pygame.draw.polygon(ids, ((index >> 16) & 255, (index >> 8) & 255, index & 255), points)
+        rgb = pygame.surfarray.array3d(ids).astype(np.int64)
+        return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+    def sprite(self, size, offset=(0, 0)):
+        """
+        Surface (colorkey) du maillage décalé de offset, mise en cache : la carte des triangles
+        est refaite si la taille ou la géométrie change, les pixels seulement si les couleurs changent.
+        """
+        key = (tuple(size), tuple(offset))
+        if self.sprite_surface is None or self.sprite_key != key:
+            self.sprite_ids = self.rasterizeIds(size, offset)
+            self.sprite_surface = pygame.Surface(size, 0, 32)
+            self.sprite_surface.set_colorkey(SPRITE_COLORKEY)
+            self.sprite_key = key
+            self.sprite_colors = None
+        if self.sprite_colors is None or not np.array_equal(self.colors, self.sprite_colors):
+            surface = self.sprite_surface
+            r_shift, g_shift, b_shift, _ = surface.get_shifts()
+            lut = np.empty(len(self) + 1, dtype=np.uint32)
+            lut[0] = surface.map_rgb(SPRITE_COLORKEY)
+            colors = self.colors.astype(np.uint32)
+            lut[1:] = (colors[:, 0] << r_shift) | (colors[:, 1] << g_shift) | (colors[:, 2] << b_shift)
+            pixels = pygame.surfarray.pixels2d(surface)
+            pixels[...] = lut[self.sprite_ids]
+            del pixels  # Libère le verrou de la surface avant le blit
+            self.sprite_colors = self.colors
+        return self.sprite_surface
+
+    def draw(self, surface):
+        """Un seul polygone par triangle, ceux entièrement hors de surface sont ignorés"""
+        if not len(self):
+            return
+        width, height = surface.get_size()
+        mins = self.vertices.min(axis=1)
+        maxs = self.vertices.max(axis=1)
+        visible = (maxs[:, 0] >= 0) & (maxs[:, 1] >= 0) & (mins[:, 0] < width) & (mins[:, 1] < height)
+        for points, color in zip(self.vertices[visible].tolist(), self.colors[visible].tolist()):
+            pygame.draw.polygon(surface, color, points)
+
+    def explode(self, center_x, center_y, speed_min, speed_max):
+        """
+        Vitesse de chaque triangle, vers l'extérieur depuis le centre, plus un peu de bruit.
+        Les tirages random se font triangle par triangle (vitesse, bruit x, bruit y).
+        """
+        draws = np.array([(random.uniform(speed_min, speed_max), random.uniform(-1, 1), random.uniform(-1, 1))
+                          for _ in range(len(self))]).reshape(-1, 3)
+        delta = self.vertices.astype(np.float64).mean(axis=1) - (center_x, center_y)
+        dist = np.hypot(delta[:, 0], delta[:, 1])
+        dist[dist == 0] = 1
+        self.velocities = delta / dist[:, None] * draws[:, :1] + draws[:, 1:]
+
+    def step(self, acceleration, fade):
+        """Une frame d'explosion : déplacement, accélération et assombrissement de fade par canal"""
+        self.vertices += self.velocities[:, None, :].astype(np.float32)
+        self.velocities *= acceleration
+        self.colors = np.maximum(self.colors.astype(np.int16) - fade, 0).astype(np.uint8)
+        self.sprite_surface = None  # La géométrie a bougé
@@ -2,7 +2,7 @@ import random
 
 from Objects.Satellite import Satellite
 from Objects.Alien import Alien
-from Objects.Star import Star
+from Objects.StarField import StarField
 from Objects.Earth import *
 from Objects.Moon import *
 from Objects.StellarObject import *
@@ -50,21 +50,20 @@ def generate_Alien(x, y, lifetime, additions):
 
 def star_generator(number):
     """
-    Generate a number of Star with random properties.
+    Generate a StarField of number stars with random properties.
     1. Randomly determine the number of triangles (3 to 8).
     2. Randomly determine the size of the star (4 to 8 px).
     3. Randomly determine the position of the star inside the game window
     4. Randomly determine the color of the star (white, gold, or light blue).
     """
-    stars = []
+    xs, ys, num_triangles, sizes, colors = [], [], [], [], []
     for _ in range(number):
-        num_triangle = random.randint(3, 8)
-        size = random.randint(3, 6)
-        x = random.randint(0, SCREEN_WIDTH)
-        y = random.randint(0, SCREEN_HEIGHT)
-        color = random.choice([(255, 255, 255), (255, 215, 0), (173, 216, 230)])
-        stars.append(Star(x, y, num_triangle, size, color))
-    return stars
+        num_triangles.append(random.randint(3, 8))
+        sizes.append(random.randint(3, 6))
+        xs.append(random.randint(0, SCREEN_WIDTH))
+        ys.append(random.randint(0, SCREEN_HEIGHT))
+        colors.append(random.choice([(255, 255, 255), (255, 215, 0), (173, 216, 230)]))
+    return StarField(xs, ys, num_triangles, sizes, colors, SCREEN_WIDTH, SCREEN_HEIGHT)
 
 def generate_earth(rows, cols, spacing, music_length=60000, width=1920, height=1080):
     triangleList = []
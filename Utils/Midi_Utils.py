@@ -1,11 +1,11 @@
-import pretty_midi
 import scipy.stats
 import numpy as np
+from midi_part.midi_loader import load_midi
 
 def readMidi(filepath):
     all_notes = []
     
-    midi_data = pretty_midi.PrettyMIDI(filepath)
+    midi_data = load_midi(filepath)
     for instrument in midi_data.instruments:
         all_notes.append(instrument.notes)
     
@@ -54,4 +54,44 @@ def get_min_max_pitch(noteList):
             elif (i.pitch < minPitch):
                 minPitch = i.pitch
 
-    return minPitch, maxPitch
\ No newline at end of file
+    return minPitch, maxPitch
+
+def velocityBuckets(velocities):
+    # velocityRange of every note at once (median and IQR computed once)
+    velocities = np.asarray(velocities)
+    med = np.median(velocities)
+    iqr = scipy.stats.iqr(velocities)
+    return np.select([velocities <= med - iqr/2, velocities <= med, velocities <= med + iqr/2],
+                     [2, 3, 4], default=5)
+
+class SpawnTimeline:
+    """
+    Notes of one instrument compiled for the animation: sorted by start, with the
+    y position, lifetime and velocity bucket of each note computed once at load time.
+    Plain lists, read one value at a time by the frame loop.
+    """
+    def __init__(self, note_array, minPitch, maxPitch, height):
+        notes = note_array[np.argsort(note_array['start'], kind='stable')]
+        pitch_step = int(height / (maxPitch - minPitch)) if maxPitch > minPitch else 0
+        self.starts = notes['start'].tolist()
+        self.ys = ((notes['pitch'].astype(np.int64) - minPitch) * pitch_step).tolist()
+        self.lifetimes = (notes['end'] - notes['start']).tolist()
+        self.velocities = notes['velocity'].tolist()
+        self.velocity_buckets = velocityBuckets(notes['velocity']).tolist() if len(notes) else []
+
+    def __len__(self):
+        return len(self.starts)
+
+class SpawnCursor:
+    """Position in a SpawnTimeline, only moves forward (O(1) amortized per note)"""
+    def __init__(self, timeline):
+        self.timeline = timeline
+        self.position = 0
+
+    def advance(self, time_s):
+        # Indices of the notes starting up to time_s that were not returned yet
+        first = self.position
+        starts = self.timeline.starts
+        while self.position < len(starts) and starts[self.position] <= time_s:
+            self.position += 1
+        return range(first, self.position)
@@ -26,9 +26,3 @@ def randomColor(color_name):
 def curveCalculation(x):
     return 1080 - ((x / 3200) * (1920 - x) + 100)
     # 1080 - the result so that it creates the curve at the bottom of the screen and not at the top
-
-def get_random_stars(stars):
-    available = [s for s in stars if s.is_static()]  # filtre
-    if available:  # vérifie qu'il en reste
-        return random.choice(available)
-    return None  # si toutes les étoiles bougent déjà
\ No newline at end of file
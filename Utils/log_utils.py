@@ -0,0 +1,74 @@
+import json
+import logging
+import os
+import time
+
+from config import VERBOSE_LOGGING, LOG_JSON_FILE
+
+# -------------------- Logging --------------------
+# Console output keeps the plain print() look ("%(message)s"). VERBOSE_LOGGING
+# enables the DEBUG level (per-note dumps, FPS...), otherwise only INFO and up
+# reach the terminal. When LOG_JSON_FILE is set, every record is also appended
+# to it as one JSON object per line, with the `fields` passed in `extra`:
+#     logger.info("Progress %.1f%%", p, extra={'fields': {'progress': p}})
+
+_configured = False
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats a record as a single JSON line"""
+    def format(self, record):
+        entry = {
+            'ts': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def _configure():
+    global _configured
+    _configured = True
+
+    root = logging.getLogger('musicsync')
+    root.setLevel(logging.DEBUG if VERBOSE_LOGGING else logging.INFO)
+    root.propagate = False
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(message)s'))
+    root.addHandler(console)
+
+    if LOG_JSON_FILE:
+        directory = os.path.dirname(LOG_JSON_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        json_sink = logging.FileHandler(LOG_JSON_FILE, encoding='utf-8')
+        json_sink.setFormatter(JsonLinesFormatter())
+        root.addHandler(json_sink)
+
+def get_logger(name):
+    """Logger of the project, configured from config.py on first use"""
+    if not _configured:
+        _configure()
+    return logging.getLogger(f'musicsync.{name}')
+
+class RateLimiter:
+    """
+    Lets a message through at most once every interval_s seconds.
+    Meant for frame loops: checking ready() costs one clock read, so the
+    record (and the terminal I/O) is only built when it will be emitted.
+    """
+    def __init__(self, interval_s=1.0):
+        self.interval_s = interval_s
+        self.last = None
+
+    def ready(self):
+        now = time.monotonic()
+        if self.last is not None and now - self.last < self.interval_s:
+            return False
+        self.last = now
+        return True
@@ -1,20 +1,23 @@
-import math
 import pygame
-import random
 from Objects.Moon import *
+from Objects.Star import StarState
 from Utils.Midi_Utils import *
 from Utils.Generators import *
-from config import FPS
+from config import FPS, LOG_PROGRESS_INTERVAL_S
+from Utils.log_utils import get_logger, RateLimiter
+
+logger = get_logger('animation')
 
 mp3_path = ""
 midi_path = ""
-stars = []
+prepared = None
+stars = None
 objects = []
-notesList = []
-pianoNotes = []
-trumpetNotes = []
+pianoTimeline = None
+trumpetTimeline = None
+pianoCursor = None
+trumpetCursor = None
 minPitch, maxPitch = None,None
-stars = 0
 music_length = 0
 # Generate objects
 earth = None
@@ -29,27 +32,107 @@ spacing = 24
 cols = int(width / spacing) + 1
 rows = int((curveCalculation(width/2)) / spacing) + 1
 
-def init_simu():
-    global stars, objects, notesList, pianoNotes, trumpetNotes, minPitch, maxPitch, music_length, earth, moon
+def prepare_animation(midi: str):
+    """Spawn timelines, pitch range and length of the MIDI file, compiled once and reused by every init_simu"""
+    midi_data = load_midi(midi)
+    pitches = midi_data.notes['pitch']
+    min_pitch, max_pitch = int(pitches.min()), int(pitches.max())
+    return {
+        'timelines': [SpawnTimeline(instrument.note_array, min_pitch, max_pitch, height)
+                      for instrument in midi_data.instruments],
+        'minPitch': min_pitch,
+        'maxPitch': max_pitch,
+        'music_length': midi_data.get_end_time() * 1000,
+    }
+
+def init_simu(play_music=True):
+    global stars, objects, pianoTimeline, trumpetTimeline, pianoCursor, trumpetCursor, minPitch, maxPitch, music_length, earth, moon
     objects = []
-    notesList = readMidi(midi_path)
-    pianoNotes = seperateInstrument(notesList, 0)
-    trumpetNotes = seperateInstrument(notesList, 1)
-    minPitch, maxPitch = get_min_max_pitch(notesList)
-    stars = star_generator(len(pianoNotes) + len(trumpetNotes))
-    music_length = pretty_midi.PrettyMIDI(midi_path).get_end_time() * 1000
+    data = prepared if prepared is not None else prepare_animation(midi_path)
+    pianoTimeline = seperateInstrument(data['timelines'], 0)
+    trumpetTimeline = seperateInstrument(data['timelines'], 1)
+    # New cursors: the timelines themselves are never modified
+    pianoCursor = SpawnCursor(pianoTimeline)
+    trumpetCursor = SpawnCursor(trumpetTimeline)
+    minPitch, maxPitch = data['minPitch'], data['maxPitch']
+    stars = star_generator(len(pianoTimeline) + len(trumpetTimeline))
+    music_length = data['music_length']
     # Generate objects
     earth = generate_earth(rows, cols, spacing, music_length)
     moon = Moon(spacing, earth.center_x, earth.center_y * 2, orbit_radius=2150, moon_radius=200, collide_earth_ms=music_length)
-    pygame.mixer.music.load(mp3_path)
-    pygame.mixer.music.play()
+    if play_music:
+        pygame.mixer.music.load(mp3_path)
+        pygame.mixer.music.play()
 
-def start_animation(mp3: str, midi: str):
-    pygame.init()
-    
-    global mp3_path, midi_path
+def load_simulation(mp3: str, midi: str, prepared_data=None):
+    """Files of the simulation, prepared_data: result of prepare_animation(midi), read from midi when None"""
+    global mp3_path, midi_path, prepared
     mp3_path = mp3
     midi_path = midi
+    prepared = prepared_data
+
+def step_frame(screen, elapsed_time_s, render=True):
+    """
+    Advances the simulation to elapsed_time_s and draws the frame on screen.
+    render=False (fast-forward of the offline render) skips the work that does not
+    change the state: Earth / Moon colours and the pure draws. Drawing functions
+    that move their object (satellites, aliens) still run on screen.
+    """
+    screen.fill((10, 10, 25))
+    exploding = music_length - (elapsed_time_s*1000) <= 0
+
+    if music_length - (elapsed_time_s*1000) > -5000:
+        # Notes starting since the last frame, all of them spawn (chords included)
+        new_piano_notes = pianoCursor.advance(elapsed_time_s)
+        new_trumpet_notes = trumpetCursor.advance(elapsed_time_s)
+
+        # Drawing background: a random static star leaves for each new note
+        for note in new_trumpet_notes:
+            stars.launch(StarState.EXPLODING)
+        for note in new_piano_notes:
+            stars.launch(StarState.MOVING)
+
+        # Static layer, then the moving / exploding stars (off-screen or burnt out ones are removed)
+        stars.update(screen, render)
+
+        # The explosion starts from the colours of this frame
+        if earth is not None:
+            earth.update(elapsed_time_s*1000, colors=render or exploding)
+            if render:
+                earth.draw(screen)
+
+        if moon is not None:
+            moon.update(elapsed_time_s*1000, colors=render or exploding)
+            if render:
+                moon.draw(screen)
+
+        # Generate Satellite or Alien when a note begins
+        for i in new_trumpet_notes:
+            x = width - 50
+            instru = generate_Alien(x, trumpetTimeline.ys[i], trumpetTimeline.lifetimes[i], trumpetTimeline.velocity_buckets[i])
+            objects.append(instru)
+
+        for i in new_piano_notes:
+            x = 50
+            instru = generate_Satellite(x, pianoTimeline.ys[i], pianoTimeline.lifetimes[i], pianoTimeline.velocity_buckets[i])
+            objects.append(instru)
+
+        # Draw all satellites and aliens
+        for obj in objects[:]:
+            obj.update()
+            if obj.life_time <= 0:
+                objects.remove(obj)
+            else:
+                obj.draw(screen)
+
+    if exploding:
+        earth.trigger_explosion()
+        moon.trigger_explosion()
+
+def start_animation(mp3: str, midi: str, prepared_data=None):
+    """prepared_data: result of prepare_animation(midi), read from midi when None"""
+    pygame.init()
+    load_simulation(mp3, midi, prepared_data)
 
     # Initialization
     screen = pygame.display.set_mode((width, height))
@@ -58,101 +141,24 @@ def start_animation(mp3: str, midi: str):
 
     # Checks each x and y position for the triangles, assigns them a noise value, and then a color based on it
     start_time = pygame.time.get_ticks()
-    last_time = 0.0
-    big_bang_triangles = []
     running = True
+    fps_limiter = RateLimiter(LOG_PROGRESS_INTERVAL_S)
 
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
 
-        screen.fill((10, 10, 25))
         elapsed_time_s = round((pygame.time.get_ticks() - start_time) / 1000,2)
-            
-        if music_length - (elapsed_time_s*1000) > -5000:
-            # Drawing background
-            new_piano_notes = [note for note in pianoNotes
-                        if last_time < note.start <= elapsed_time_s]
-
-            new_trumpet_notes = [note for note in trumpetNotes
-                    if last_time < note.start <= elapsed_time_s]
-                
-            if stars != []:
-                for note in new_trumpet_notes:
-                    star = get_random_stars(stars)
-                    star.set_exploding()
-                    star.move_angle = random.uniform(0, 2 * math.pi)
-
-            if stars != []:
-                for note in new_piano_notes:
-                    star = get_random_stars(stars)
-                    star.set_moving()
-                    star.move_angle = random.uniform(0, 2 * math.pi)
-                    
-            """
-            for each star update graphics and rotate them
-            """
-            for star in stars:
-                star.update(screen)
-                star.draw(screen)
-                star.rotation += star.rotation_speed
-
-                if star.state is None or star.is_off_screen(SCREEN_WIDTH, SCREEN_HEIGHT):
-                    stars.remove(star)
-                    
-            if earth is not None:
-                earth.update(elapsed_time_s*1000)
-                earth.draw(screen)
-
-            if moon is not None:
-                moon.update(elapsed_time_s*1000)
-                moon.draw(screen)
-                
-            # Find the start for each instrument
-            new_trumpet_notes = [note for note in trumpetNotes
-                                if last_time < note.start <= elapsed_time_s]
-            new_piano_notes = [note for note in pianoNotes
-                                if last_time < note.start <= elapsed_time_s]
-            
-            # Generate Satellite or Alien when a note begins
-            if new_trumpet_notes not in (None, []):
-                y = int(trumpetNotes[0].pitch - minPitch) * int(height / (maxPitch - minPitch))
-                x = width - 50
-                instru = generate_Alien(x,y, noteLifetime(trumpetNotes[0]), velocityRange(trumpetNotes, trumpetNotes[0]))
-                objects.append(instru)
-                del trumpetNotes[0]
-
-            if new_piano_notes not in (None, []):
-                y = int(new_piano_notes[0].pitch - minPitch) * int(height / (maxPitch - minPitch))
-                x = 50
-                instru = generate_Satellite(x, y, noteLifetime(pianoNotes[0]), velocityRange(pianoNotes, pianoNotes[0]))
-                print(pianoNotes[0].velocity)
-                objects.append(instru)
-                del pianoNotes[0]
-            
-            # Draw all satellites and aliens
-            for obj in objects[:]:
-                obj.update()
-                if obj.life_time <= 0:
-                    objects.remove(obj)
-                else:
-                    obj.draw(screen)
-                    
-        if music_length - (elapsed_time_s*1000) <= 0:
-            earth.trigger_explosion()
-            moon.trigger_explosion()
+        step_frame(screen, elapsed_time_s)
 
         if music_length - (elapsed_time_s*1000) <= -1000:
             init_simu()
-            elapsed_time_s = 0
-            big_bang_triangles = []
             start_time = pygame.time.get_ticks()
 
-        last_time = elapsed_time_s
-
         pygame.display.flip()
         clock.tick(FPS)  
-        print(clock.get_fps())
+        if fps_limiter.ready():
+            logger.debug("FPS: %.1f", clock.get_fps())
 
-    pygame.quit()
\ No newline at end of file
+    pygame.quit()
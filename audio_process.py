@@ -1,35 +1,122 @@
 import librosa
 import numpy as np
-import time
 from scipy.signal import find_peaks
 from scipy.ndimage import median_filter
 from scipy.interpolate import interp1d
 
+from config import FPS, FREQ_MIN, FREQ_MAX, BINS_PER_OCTAVE, N_OCTAVES, CQT_FILTER_SCALE, CQT_SPARSITY
+from instrumentation import NULL_TIMER
+from Utils.log_utils import get_logger
+
+logger = get_logger('audio_process')
+
 # -------------------- Load & preprocess --------------------
-def preprocess_audio(file_path):
-    """Enhanced audio preprocessing with better separation techniques"""
-    print("Loading and preprocessing audio with enhanced techniques...")
-    start_time = time.time()
+def load_audio(file_path):
+    """Decodes file_path to mono at its native sample rate, returns (y, sr)"""
+    return librosa.load(file_path, mono=True, sr=None)
+
+def preprocess_audio(file_path, timer=NULL_TIMER, audio=None):
+    """
+    Enhanced audio preprocessing with better separation techniques.
+    audio can be an already decoded (y, sr) of file_path, the load is then skipped.
+    """
+    logger.info("Loading and preprocessing audio with enhanced techniques...")
     
     # Load audio
-    y, sr = librosa.load(file_path, mono=True, sr=None)
+    with timer.stage("load"):
+        y, sr = audio if audio is not None else load_audio(file_path)
     
     # Apply pre-emphasis to boost higher frequencies
-    pre_emphasis = 0.97
-    y = np.append(y[0], y[1:] - pre_emphasis * y[:-1])
+    with timer.stage("pre-emphasis"):
+        pre_emphasis = 0.97
+        y = np.append(y[0], y[1:] - pre_emphasis * y[:-1])
     
     # Enhanced harmonic-percussive separation with multiple margins
-    y_harmonic, y_percussive = librosa.effects.hpss(y, margin=(1.0, 5.0))
+    with timer.stage("hpss"):
+        y_harmonic, y_percussive = librosa.effects.hpss(y, margin=(1.0, 5.0))
     
     # NEW: Apply spectral gating to reduce noise between notes
-    y_gated = apply_spectral_gating(y_harmonic, sr)
+    with timer.stage("gating"):
+        y_gated = apply_spectral_gating(y_harmonic, sr)
     
-    # Use primarily harmonic component with some original signal
-    y_processed = 0.9 * y_gated + 0.1 * y
+        # Use primarily harmonic component with some original signal
+        y_processed = 0.9 * y_gated + 0.1 * y
     
-    print(f"Enhanced preprocessing completed in {time.time() - start_time:.2f} seconds")
     return y_processed, sr
 
+# -------------------- CQT analysis --------------------
+def compute_hop_length(sr):
+    """Hop length used by the CQT analysis, derived from FPS"""
+    # CQT parameters derived from config - much better for musical analysis
+    # CQT uses logarithmic frequency spacing that matches musical scales
+    hop = max(1, int(sr / FPS))
+    # Reduce hop length for better time resolution while maintaining reasonable processing speed
+    return min(hop, int(sr * 0.01))  # Maximum 10ms hop for good temporal resolution
+
+def compute_cqt(y, sr, hop_length):
+    """
+    Normalized CQT magnitude restricted to FREQ_MIN..FREQ_MAX.
+    Returns (S_filtered, cqt_freqs_filtered), one column per hop.
+    """
+    # CQT parameters optimized for musical note detection
+    # Each octave will have the same number of bins, making harmonic relationships easier to detect
+    n_bins = N_OCTAVES * BINS_PER_OCTAVE  # Cover 7 octaves (C1 to C8)
+    fmin = librosa.note_to_hz('C2')  # Start from C2 for musical range
+
+    # Compute CQT with parameters optimized for polyphonic music
+    CQT = librosa.cqt(
+        y=y,
+        sr=sr,
+        fmin=fmin,
+        n_bins=n_bins,
+        bins_per_octave=BINS_PER_OCTAVE,
+        hop_length=hop_length,
+        filter_scale=CQT_FILTER_SCALE,  # Tighter filters for better frequency separation
+        sparsity=CQT_SPARSITY           # Remove very small values to reduce noise
+    )
+
+    # Get magnitude and normalize
+    S = np.abs(CQT)
+    mx = np.max(S) if np.max(S) > 0 else 1.0
+    S_norm = S / mx
+
+    # Create frequency axis for CQT bins
+    # CQT frequencies are logarithmically spaced
+    cqt_freqs = librosa.cqt_frequencies(
+        n_bins=n_bins, 
+        fmin=fmin, 
+        bins_per_octave=BINS_PER_OCTAVE
+    )
+
+    # Filter to desired frequency range
+    band = (cqt_freqs >= FREQ_MIN) & (cqt_freqs <= FREQ_MAX)
+    return S_norm[band, :], cqt_freqs[band]
+
+def detect_onsets(y, sr, hop_length, S_filtered):
+    """Onset times (s) combining spectral-flux onsets on the audio and CQT-based peak picking"""
+    # Combine multiple onset detection methods for robustness
+    onset_frames_spectral = librosa.onset.onset_detect(
+        y=y, sr=sr, hop_length=hop_length,
+        pre_max=0.03, post_max=0.03,
+        pre_avg=0.1, post_avg=0.1,
+        delta=0.05, wait=0.03,
+        backtrack=True,
+        units='frames'
+    )
+
+    # Use CQT-based onset detection for complementary information
+    onset_envelope = np.sum(np.diff(S_filtered, axis=1, prepend=0), axis=0)
+    onset_frames_cqt = librosa.util.peak_pick(
+        onset_envelope,
+        pre_max=3, post_max=3,
+        pre_avg=10, post_avg=10,
+        delta=0.1, wait=3
+    )
+
+    # Combine and deduplicate onsets
+    all_onset_frames = np.unique(np.concatenate([onset_frames_spectral, onset_frames_cqt]))
+    return librosa.frames_to_time(all_onset_frames, sr=sr, hop_length=hop_length)
+
 def apply_spectral_gating(y, sr, gate_threshold_db=-40, attack_time=0.01, release_time=0.1):
     """
     Apply spectral gating to reduce noise during quiet periods.
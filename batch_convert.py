@@ -0,0 +1,292 @@
+"""
+Batch conversion of whole directories with a process pool.
+
+    python batch_convert.py Sounds --out Output/batch
+    python batch_convert.py "Sounds/*_Both.mp3" Sounds/SSB.mp3 --out Output/batch --workers 4
+
+Every input gives <name>_piano.mid, <name>_trumpet.mid and the combined <name>.mid
+in the output directory (sub-directories of a directory input are kept with
+--recursive). Each worker decodes its next file in a background thread while it
+analyses the current one.
+
+The per-file status is kept in <out>/manifest.json, written after every file:
+running the same command again skips the files already converted (same size and
+modification time, outputs still present) and retries the others. --force
+converts everything again.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".m4a")
+MANIFEST_NAME = "manifest.json"
+SUMMARY_STAGES = ("hpss", "cqt", "detection")  # Stages shown in the timing summary
+
+# -------------------- Inputs --------------------
+def collect_inputs(patterns, recursive=False):
+    """
+    (input path, output name) for each audio file given as file, directory or glob.
+    The output name is the path relative to the directory (or to the glob's folder)
+    without extension.
+    """
+    inputs = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            if recursive:
+                paths = glob.glob(os.path.join(pattern, "**", "*"), recursive=True)
+            else:
+                paths = glob.glob(os.path.join(pattern, "*"))
+            base = pattern
+        elif os.path.isfile(pattern):
+            paths, base = [pattern], os.path.dirname(pattern)
+        else:
+            paths = glob.glob(pattern, recursive=True)
+            base = os.path.dirname(pattern.split("*")[0].split("?")[0].split("[")[0])
+
+        for path in sorted(paths):
+            if os.path.isfile(path) and path.lower().endswith(AUDIO_EXTENSIONS):
+                name = os.path.splitext(os.path.relpath(path, base or "."))[0]
+                inputs.append((path, name))
+
+    # Same file given twice: keep the first one
+    seen = set()
+    unique = []
+    for path, name in inputs:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append((path, name))
+    return unique
+
+def output_paths(out_dir, name):
+    base = os.path.join(out_dir, name)
+    return {
+        'piano': f"{base}_piano.mid",
+        'trumpet': f"{base}_trumpet.mid",
+        'both': f"{base}.mid",
+    }
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+# -------------------- Manifest --------------------
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {'files': {}}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(path, manifest):
+    """Atomic write so an interrupted batch never leaves a truncated manifest"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def is_up_to_date(entry, input_path):
+    if not entry or entry.get('status') != 'done':
+        return False
+    if entry.get('signature') != file_signature(input_path):
+        return False
+    return all(os.path.exists(path) for path in entry['outputs'].values())
+
+# -------------------- Worker --------------------
+def _convert(job, decoded):
+    """Converts one decoded file, returns its manifest entry"""
+    from mp3_to_midi import start_conversion
+    from midi_part.midi_combinator import combine_midis
+
+    entry = {'input': job['input'], 'outputs': job['outputs'], 'signature': job['signature'], 'worker': os.getpid()}
+    start = time.perf_counter()
+    try:
+        wait_start = time.perf_counter()
+        audio, decode_s = decoded.result()
+        entry['decode_s'] = decode_s
+        entry['decode_wait_s'] = time.perf_counter() - wait_start
+
+        os.makedirs(os.path.dirname(job['outputs']['both']) or ".", exist_ok=True)
+        stats = start_conversion(job['input'], job['outputs']['piano'], job['outputs']['trumpet'],
+                                 audio=audio, timing_report_file=None)
+        combine_midis(job['outputs']['piano'], job['outputs']['trumpet'], job['outputs']['both'])
+
+        entry.update(status='done', duration_s=stats['duration_s'], frames=stats['frames'], notes=stats['notes'])
+        if stats['timing']:
+            entry['stages'] = {stage['name']: stage['wall_s'] for stage in stats['timing']['stages']}
+            entry['peak_rss_mb'] = stats['timing']['peak_rss_mb']
+    except Exception as e:
+        entry.update(status='failed', error=repr(e))
+    entry['wall_s'] = time.perf_counter() - start
+    return entry
+
+def _timed_load(path):
+    from audio_process import load_audio
+    start = time.perf_counter()
+    audio = load_audio(path)
+    return audio, time.perf_counter() - start
+
+def _worker(job_queue, result_queue, verbose):
+    """
+    Takes jobs until the None sentinel. The next job is taken as soon as the
+    current one starts so its decoding overlaps the analysis.
+    """
+    import logging
+    import mp3_to_midi  # Heavy imports once per worker, before the first job
+    if not verbose:
+        logging.getLogger('musicsync').setLevel(logging.WARNING)
+
+    with ThreadPoolExecutor(max_workers=1) as decoder:
+        job = job_queue.get()
+        decoded = decoder.submit(_timed_load, job['input']) if job else None
+        while job is not None:
+            next_job = job_queue.get()
+            next_decoded = decoder.submit(_timed_load, next_job['input']) if next_job else None
+            result_queue.put(_convert(job, decoded))
+            job, decoded = next_job, next_decoded
+
+# -------------------- Batch --------------------
+def run_batch(inputs, out_dir, workers, force=False, verbose=False):
+    """Converts inputs [(path, name)], returns the manifest"""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    files = manifest['files']
+
+    jobs = []
+    for path, name in inputs:
+        outputs = output_paths(out_dir, name)
+        if not force and is_up_to_date(files.get(name), path):
+            print(f"  {name}: up to date, skipped")
+            continue
+        jobs.append({'name': name, 'input': path, 'outputs': outputs, 'signature': file_signature(path)})
+        files[name] = {'input': path, 'outputs': outputs, 'status': 'pending'}
+    save_manifest(manifest_path, manifest)
+
+    if not jobs:
+        return manifest
+
+    # Longest files first so the tail of the batch is made of short ones
+    jobs.sort(key=lambda job: job['signature']['size'], reverse=True)
+    workers = max(1, min(workers, len(jobs)))
+
+    context = multiprocessing.get_context("spawn")
+    job_queue = context.Queue()
+    result_queue = context.Queue()
+    for job in jobs:
+        job_queue.put(job)
+    for _ in range(workers):
+        job_queue.put(None)
+
+    processes = [context.Process(target=_worker, args=(job_queue, result_queue, verbose), daemon=True)
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    batch_start = time.perf_counter()
+    remaining = {job['name'] for job in jobs}
+    names = {job['input']: job['name'] for job in jobs}
+    try:
+        while remaining:
+            try:
+                entry = result_queue.get(timeout=1.0)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    for name in remaining:
+                        files[name].update(status='failed', error='worker process died')
+                    save_manifest(manifest_path, manifest)
+                    break
+                continue
+            name = names[entry['input']]
+            remaining.discard(name)
+            files[name] = entry
+            save_manifest(manifest_path, manifest)
+            done = len(jobs) - len(remaining)
+            if entry['status'] == 'done':
+                print(f"  [{done}/{len(jobs)}] {name}: {entry['wall_s']:.1f}s")
+            else:
+                print(f"  [{done}/{len(jobs)}] {name}: FAILED ({entry['error']})")
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+    manifest['last_batch'] = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'workers': workers,
+        'files': len(jobs),
+        'wall_s': time.perf_counter() - batch_start,
+    }
+    save_manifest(manifest_path, manifest)
+    return manifest
+
+def print_summary(manifest, names):
+    """Per-file timing table of the given names"""
+    header = f"{'file':<30s} {'status':<7s} {'audio':>7s} {'wall':>7s} {'x real':>7s} {'decode':>7s} {'wait':>6s}"
+    header += "".join(f" {stage:>9s}" for stage in SUMMARY_STAGES)
+    print(f"\n{header}")
+
+    total_wall = 0.0
+    total_audio = 0.0
+    for name in names:
+        entry = manifest['files'].get(name)
+        if entry is None or 'wall_s' not in entry:
+            continue
+        if entry['status'] != 'done':
+            print(f"{name:<30s} {entry['status']:<7s}")
+            continue
+        total_wall += entry['wall_s']
+        total_audio += entry['duration_s']
+        line = (f"{name:<30s} {entry['status']:<7s} {entry['duration_s']:>6.1f}s {entry['wall_s']:>6.1f}s "
+                f"{entry['duration_s'] / max(entry['wall_s'], 1e-9):>6.1f}x "
+                f"{entry.get('decode_s', 0):>6.2f}s {entry.get('decode_wait_s', 0):>5.2f}s")
+        stages = entry.get('stages', {})
+        line += "".join(f" {stages[stage]:>8.2f}s" if stage in stages else f" {'-':>9s}" for stage in SUMMARY_STAGES)
+        print(line)
+
+    batch = manifest.get('last_batch')
+    if batch and total_wall:
+        print(f"\n{batch['files']} file(s), {total_audio:.1f}s of audio in {batch['wall_s']:.1f}s with "
+              f"{batch['workers']} worker(s) (sum of file times {total_wall:.1f}s, "
+              f"{total_wall / max(batch['wall_s'], 1e-9):.1f}x parallel speedup)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert many audio files to MIDI in parallel")
+    parser.add_argument("inputs", nargs="+", help="Audio files, directories or glob patterns")
+    parser.add_argument("--out", default="Output/batch", help="Output directory (holds the manifest)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Worker processes (default: half of the CPUs)")
+    parser.add_argument("--recursive", action="store_true", help="Also convert files in sub-directories")
+    parser.add_argument("--force", action="store_true", help="Convert again the files already done")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline messages of the workers")
+    args = parser.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs, args.recursive)
+    if not inputs:
+        print("No audio file found.")
+        return 1
+
+    names = [name for _, name in inputs]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        print(f"Several inputs give the same output name: {', '.join(sorted(duplicates))}")
+        return 1
+
+    print(f"{len(inputs)} file(s) -> {args.out}")
+    manifest = run_batch(inputs, args.out, args.workers, args.force, args.verbose)
+    print_summary(manifest, names)
+
+    failed = [name for name in names if manifest['files'][name]['status'] != 'done']
+    if failed:
+        print(f"\n{len(failed)} file(s) failed, run the same command again to retry them.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
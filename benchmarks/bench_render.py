@@ -0,0 +1,145 @@
+"""
+Per-frame cost of the Earth / Moon update and draw, headless.
+
+Run from the repository root:
+    python -m benchmarks.bench_render                      # run and compare to the baseline
+    python -m benchmarks.bench_render --save               # run and store the results as baseline
+    python -m benchmarks.bench_render --frames 300 --start 0.5
+
+The Earth and the Moon of the animation (1920x1080) are built like init_simu,
+advanced to `--start` (fraction of the music length) and then timed frame by
+frame: update (colours) and draw, before and after the explosion. The entry
+`legacy_polygons` draws the Earth triangles one pygame.draw.polygon at a time,
+the cost of the per-triangle draw the TriangleMesh sprite replaces.
+Best and median are over the frames, not over repeated runs.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy as np
+import pygame
+
+from config import FPS
+from benchmarks.bench_stages import compare, load_baseline, print_results
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "render_baseline.json")
+MUSIC_LENGTH_MS = 60000
+
+def frame_timings(times):
+    return {'min_s': min(times), 'median_s': statistics.median(times), 'repeat': len(times)}
+
+def build_scene():
+    """Earth and Moon of init_simu for a MUSIC_LENGTH_MS music"""
+    import animation
+    from Objects.Moon import Moon
+    from Utils.Generators import generate_earth
+    earth = generate_earth(animation.rows, animation.cols, animation.spacing, MUSIC_LENGTH_MS)
+    moon = Moon(animation.spacing, earth.center_x, earth.center_y * 2, orbit_radius=2150, moon_radius=200,
+                collide_earth_ms=MUSIC_LENGTH_MS)
+    return earth, moon, (animation.width, animation.height)
+
+def time_frames(objects, screen, first_frame, frames):
+    """{name: [s per frame]} of update / draw of each (name, object)"""
+    times = {f"{name}_{step}": [] for name, _ in objects for step in ("update", "draw")}
+    for frame in range(first_frame, first_frame + frames):
+        elapsed_ms = frame / FPS * 1000
+        screen.fill((10, 10, 25))
+        for name, obj in objects:
+            start = time.perf_counter()
+            obj.update(elapsed_ms)
+            times[f"{name}_update"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            obj.draw(screen)
+            times[f"{name}_draw"].append(time.perf_counter() - start)
+    return times
+
+def run_benchmarks(frames=120, start=0.5):
+    """Returns {"phase/entry": timing}, timings per frame"""
+    pygame.display.init()
+    earth, moon, size = build_scene()
+    screen = pygame.Surface(size)
+
+    first_frame = int(MUSIC_LENGTH_MS / 1000 * FPS * start)
+    for frame in range(first_frame):
+        elapsed_ms = frame / FPS * 1000
+        earth.update(elapsed_ms, colors=False)
+        moon.update(elapsed_ms, colors=False)
+
+    results = {}
+    for key, times in time_frames([("earth", earth), ("moon", moon)], screen, first_frame, frames).items():
+        results[f"orbit/{key}"] = frame_timings(times)
+
+    triangles = [(points, color) for points, color in zip(earth.mesh.vertices.tolist(), earth.mesh.colors.tolist())]
+    legacy = []
+    for _ in range(min(frames, 30)):
+        start_s = time.perf_counter()
+        for points, color in triangles:
+            pygame.draw.polygon(screen, color, points)
+        legacy.append(time.perf_counter() - start_s)
+    results["orbit/legacy_polygons"] = frame_timings(legacy)
+    results["orbit/legacy_polygons"]['triangles'] = len(triangles)
+
+    earth.trigger_explosion()
+    moon.trigger_explosion()
+    end_frame = int(MUSIC_LENGTH_MS / 1000 * FPS)
+    for key, times in time_frames([("earth", earth), ("moon", moon)], screen, end_frame, frames).items():
+        results[f"explosion/{key}"] = frame_timings(times)
+    pygame.quit()
+    return results
+
+def save_baseline(path, results, frames):
+    data = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pygame': pygame.version.ver,
+            'machine': platform.platform(),
+            'frames': frames,
+        },
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-frame cost of the Earth / Moon update and draw")
+    parser.add_argument("--frames", type=int, default=120, help="Timed frames per phase")
+    parser.add_argument("--start", type=float, default=0.5, help="Fraction of the music played before timing")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown ratio before flagging (0.25 = +25%%)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.frames, args.start)
+    baseline = load_baseline(args.baseline)
+    print_results(results, baseline, label="phase/entry")
+
+    if args.save:
+        save_baseline(args.baseline, results, args.frames)
+        print(f"\nBaseline saved: {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}, run with --save to create one.")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above +{args.threshold * 100:.0f}%:")
+        for key, reference, current, ratio in regressions:
+            print(f"  {key}: {reference * 1000:.2f}ms -> {current * 1000:.2f}ms ({ratio:.2f}x)")
+        return 1
+    print("\nNo regression.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Microbenchmarks of the transcription stages on deterministic synthetic signals.
+
+Run from the repository root:
+    python -m benchmarks.bench_stages                      # run and compare to the baseline
+    python -m benchmarks.bench_stages --save               # run and store the results as baseline
+    python -m benchmarks.bench_stages --lengths 1 4 --signals sine chord
+
+Each entry is timed `--repeat` times and the best time is kept. A stage is
+flagged as a regression when its best time is more than `--threshold` (ratio)
+slower than the baseline; the exit code is then 1.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import librosa
+import numpy as np
+from scipy.io import wavfile
+
+from audio_process import (preprocess_audio, apply_spectral_gating, apply_spectral_masking_removal,
+                           compute_hop_length, compute_cqt, detect_onsets)
+from config import SMOOTHING_TIME, MIN_NOTE_DURATION, DETECTION_THRESHOLD
+from midi_part.midi_comparator import pre_traitement_notes
+from Note import NoteTracker
+from note_detection import detect_notes_with_cqt_onsets
+from benchmarks.synthetic import SAMPLE_RATE, SIGNALS, synthetic_note_pairs
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_LENGTHS = (1.0, 4.0, 16.0)
+MASKING_MAX_LENGTH = 0.5   # apply_spectral_masking_removal is pure Python, keep its input short
+NOTES_PER_SECOND = 8       # Density of the synthetic notes given to pre_traitement_notes
+
+def time_call(func, repeat):
+    """Best and median wall time of func() over `repeat` runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'min_s': min(times), 'median_s': statistics.median(times), 'repeat': repeat}
+
+def bench_signal(name, y, sr, repeat, tmp_dir, include_masking=True):
+    """All stage timings for one signal, keyed by stage name"""
+    length = len(y) / sr
+    results = {}
+
+    wav_path = os.path.join(tmp_dir, f"{name}_{length:g}s.wav")
+    wavfile.write(wav_path, sr, y)
+    results['preprocess_audio'] = time_call(lambda: preprocess_audio(wav_path), repeat)
+
+    results['apply_spectral_gating'] = time_call(lambda: apply_spectral_gating(y, sr), repeat)
+
+    if include_masking:
+        masking_y = y[:int(min(length, MASKING_MAX_LENGTH) * sr)]
+        S_stft = np.abs(librosa.stft(masking_y, n_fft=2048, hop_length=512))
+        results['apply_spectral_masking_removal'] = time_call(lambda: apply_spectral_masking_removal(S_stft), repeat)
+        results['apply_spectral_masking_removal']['input_s'] = len(masking_y) / sr
+
+    hop = compute_hop_length(sr)
+    results['cqt'] = time_call(lambda: compute_cqt(y, sr, hop), repeat)
+
+    S_filtered, cqt_freqs = compute_cqt(y, sr, hop)
+    onset_times = detect_onsets(y, sr, hop, S_filtered)
+    frame_count = S_filtered.shape[1]
+    frame_times = np.arange(frame_count) * hop / sr
+
+    def detect_all():
+        return [detect_notes_with_cqt_onsets(S_filtered[:, i], cqt_freqs, frame_times[i], onset_times, max_notes=5)
+                for i in range(frame_count)]
+    results['detect_notes_per_frame'] = time_call(detect_all, repeat)
+    results['detect_notes_per_frame']['per_frame_s'] = results['detect_notes_per_frame']['min_s'] / max(frame_count, 1)
+    detections = detect_all()
+
+    def track():
+        tracker = NoteTracker(smoothing_time=SMOOTHING_TIME, min_duration=MIN_NOTE_DURATION,
+                              detection_threshold=DETECTION_THRESHOLD)
+        for frame_time, notes in zip(frame_times, detections):
+            tracker.update_note_tracker_with_prediction(frame_time, notes)
+        tracker.finalize(length)
+        return tracker
+    results['note_tracker_update'] = time_call(track, repeat)
+
+    tracker = track()
+    midi_path = os.path.join(tmp_dir, "bench_export.mid")
+    results['note_tracker_export'] = time_call(lambda: tracker.export_to_midi(midi_path), repeat)
+
+    return results
+
+def run_benchmarks(lengths=DEFAULT_LENGTHS, signals=None, repeat=3):
+    """Runs every stage on every (signal, length); returns {"stage/signal/length": timing}"""
+    signals = signals or list(SIGNALS)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Warm-up pass so numba/librosa first-call compilation is not counted
+        bench_signal("warmup", SIGNALS["sine"](0.5), SAMPLE_RATE, 1, tmp_dir)
+
+        masking_done = set()  # Masking input is capped, time it once per signal
+        for length in lengths:
+            for name in signals:
+                y = SIGNALS[name](length)
+                timings = bench_signal(name, y, SAMPLE_RATE, repeat, tmp_dir, include_masking=name not in masking_done)
+                for stage, timing in timings.items():
+                    stage_length = timing.get('input_s', length)
+                    results[f"{stage}/{name}/{stage_length:g}s"] = timing
+                masking_done.add(name)
+                print(f"  {name} ({length:g}s) done")
+
+            ref_notes, created_notes = synthetic_note_pairs(int(length * NOTES_PER_SECOND))
+            timing = time_call(lambda: pre_traitement_notes(ref_notes, created_notes), repeat)
+            timing['notes'] = len(created_notes)
+            results[f"pre_traitement_notes/notes/{length:g}s"] = timing
+    return results
+
+def compare(results, baseline, threshold):
+    """List of (key, baseline_s, current_s, ratio) slower than baseline by more than threshold"""
+    regressions = []
+    for key, timing in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        ratio = timing['min_s'] / max(reference['min_s'], 1e-9)
+        if ratio > 1 + threshold:
+            regressions.append((key, reference['min_s'], timing['min_s'], ratio))
+    return regressions
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['results']
+
+def save_baseline(path, results, repeat):
+    data = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'librosa': librosa.__version__,
+            'machine': platform.platform(),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+def print_results(results, baseline, label="stage/signal/length"):
+    print(f"\n{label:<55s} {'best':>10s} {'median':>10s} {'vs base':>8s}")
+    for key, timing in results.items():
+        ratio = ""
+        if baseline and key in baseline:
+            ratio = f"{timing['min_s'] / max(baseline[key]['min_s'], 1e-9):.2f}x"
+        print(f"{key:<55s} {timing['min_s'] * 1000:>8.2f}ms {timing['median_s'] * 1000:>8.2f}ms {ratio:>8s}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stage microbenchmarks on synthetic signals")
+    parser.add_argument("--lengths", type=float, nargs="+", default=list(DEFAULT_LENGTHS), help="Signal lengths in seconds")
+    parser.add_argument("--signals", nargs="+", choices=list(SIGNALS), help="Subset of synthetic signals")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per entry, the best one is kept")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown ratio before flagging (0.25 = +25%%)")
+    args = parser.parse_args(argv)
+
+    # Pipeline messages ("No notes to export"...) would drown the results
+    logging.getLogger('musicsync').setLevel(logging.ERROR)
+
+    results = run_benchmarks(args.lengths, args.signals, args.repeat)
+    baseline = load_baseline(args.baseline)
+    print_results(results, baseline)
+
+    if args.save:
+        save_baseline(args.baseline, results, args.repeat)
+        print(f"\nBaseline saved: {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}, run with --save to create one.")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above +{args.threshold * 100:.0f}%:")
+        for key, reference, current, ratio in regressions:
+            print(f"  {key}: {reference * 1000:.2f}ms -> {current * 1000:.2f}ms ({ratio:.2f}x)")
+        return 1
+    print("\nNo regression.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""
+End-to-end regression runner: every (audio, reference MIDI) pair of a corpus goes
+through start_conversion, then the transcription is scored with midi_comparator.
+
+Run from the repository root:
+    python -m benchmarks.corpus_regression                   # Sounds/, compare to the last run
+    python -m benchmarks.corpus_regression --dir Output/corpus --only random
+    python -m benchmarks.corpus_regression --no-record       # do not append to the history
+
+Each run appends one JSON line to the history file (benchmarks/history.jsonl),
+keyed by the git commit. A file is flagged when it got slower than the previous
+run by more than --speed-tolerance (ratio of the wall time) or when its overall
+score dropped by more than --accuracy-tolerance points; the exit code is then 1.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_HISTORY = os.path.join(os.path.dirname(__file__), "history.jsonl")
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg")
+MIDI_EXTENSIONS = (".mid", ".midi")
+
+# Metrics of FileData kept in the history, per instrument
+METRIC_FIELDS = ('ref_count', 'created_count', 'pitch_exact', 'pitch_at_1',
+                 'avg_start_diff', 'avg_duration_diff', 'overall_score', 'precision', 'recall', 'f1',
+                 'frame_precision', 'frame_recall', 'frame_accuracy')
+
+def discover_pairs(directory):
+    """
+    (name, audio path, reference path) for each audio file with a reference MIDI:
+    same stem ("Gamme.mp3" / "Gamme.mid"), or for "<piece>_Both" recordings the
+    MIDI starting with "<piece>" ("PinkPanther_Both.mp3" / "PinkPanther.midi").
+    """
+    files = sorted(os.listdir(directory))
+    midis = {os.path.splitext(f)[0]: f for f in files if f.lower().endswith(MIDI_EXTENSIONS)}
+
+    pairs = []
+    for audio in files:
+        if not audio.lower().endswith(AUDIO_EXTENSIONS):
+            continue
+        stem = os.path.splitext(audio)[0]
+        reference = midis.get(stem)
+        if reference is None and stem.endswith("_Both"):
+            piece = stem[:-len("_Both")]
+            candidates = [m for s, m in midis.items() if s == piece or s.startswith(piece + "_")]
+            reference = candidates[0] if len(candidates) == 1 else None
+        if reference is not None:
+            pairs.append((stem, os.path.join(directory, audio), os.path.join(directory, reference)))
+    return pairs
+
+def git_commit():
+    """(commit hash, dirty flag), (None, None) outside a git checkout"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                capture_output=True, text=True, check=True).stdout
+        return commit, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def run_pair(name, audio_path, reference_path, out_dir):
+    """
+    Converts one file and scores it. Runs in its own process (see run_corpus)
+    so peak_rss_mb is the peak of this file only.
+    """
+    from instrumentation import peak_rss_mb
+    from mp3_to_midi import start_conversion
+    from midi_part.midi_combinator import combine_midis
+    from midi_part.midi_comparator import compare_midi
+    from midi_part.midi_loader import load_midi
+
+    # Only warnings and errors of the pipeline, the runner prints its own summary
+    logging.getLogger('musicsync').setLevel(logging.WARNING)
+
+    piano_path = os.path.join(out_dir, f"{name}_piano.mid")
+    trumpet_path = os.path.join(out_dir, f"{name}_trumpet.mid")
+    both_path = os.path.join(out_dir, f"{name}_both.mid")
+
+    start = time.perf_counter()
+    stats = start_conversion(audio_path, piano_path, trumpet_path)
+    wall_s = time.perf_counter() - start
+
+    combine_midis(piano_path, trumpet_path, both_path)
+    instruments = {}
+    for inst_name, data in compare_midi(load_midi(reference_path), both_path):
+        instruments[inst_name or f"#{len(instruments)}"] = {field: getattr(data, field) for field in METRIC_FIELDS}
+
+    scores = [metrics['overall_score'] for metrics in instruments.values()]
+    return {
+        'audio': audio_path,
+        'reference': reference_path,
+        'wall_s': wall_s,
+        'duration_s': stats['duration_s'],
+        'frames': stats['frames'],
+        'frames_per_s': stats['frames'] / wall_s if wall_s > 0 else 0.0,
+        'realtime_factor': stats['duration_s'] / wall_s if wall_s > 0 else 0.0,
+        'notes': stats['notes'],
+        'peak_rss_mb': peak_rss_mb(),
+        'overall_score': sum(scores) / len(scores) if scores else 0.0,
+        'instruments': instruments,
+    }
+
+def run_corpus(pairs):
+    """Runs every pair, each one in a fresh process; returns {name: result}"""
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name, audio_path, reference_path in pairs:
+            with context.Pool(1) as pool:
+                try:
+                    results[name] = pool.apply(run_pair, (name, audio_path, reference_path, out_dir))
+                except Exception as e:
+                    results[name] = {'audio': audio_path, 'reference': reference_path, 'error': repr(e)}
+            result = results[name]
+            if 'error' in result:
+                print(f"  {name}: FAILED ({result['error']})")
+            else:
+                print(f"  {name}: {result['wall_s']:.1f}s, {result['frames_per_s']:.0f} frames/s, "
+                      f"score {result['overall_score']:.1f}")
+    return results
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def append_history(path, entry):
+    with open(path, 'a') as f:
+        f.write(json.dumps(entry) + "\n")
+
+def previous_results(history):
+    """{name: result} of the latest successful run of each file"""
+    previous = {}
+    for entry in history:
+        for name, result in entry['files'].items():
+            if 'error' not in result:
+                previous[name] = dict(result, commit=entry.get('commit'))
+    return previous
+
+def compare(results, previous, speed_tolerance, accuracy_tolerance):
+    """List of (name, message) for the files slower or less accurate than their previous run"""
+    regressions = []
+    for name, result in results.items():
+        if 'error' in result:
+            regressions.append((name, f"failed: {result['error']}"))
+            continue
+        reference = previous.get(name)
+        if reference is None:
+            continue
+        ratio = result['wall_s'] / max(reference['wall_s'], 1e-9)
+        if ratio > 1 + speed_tolerance:
+            regressions.append((name, f"wall time {reference['wall_s']:.2f}s -> {result['wall_s']:.2f}s ({ratio:.2f}x)"))
+        drop = reference['overall_score'] - result['overall_score']
+        if drop > accuracy_tolerance:
+            regressions.append((name, f"overall score {reference['overall_score']:.1f} -> "
+                                      f"{result['overall_score']:.1f} (-{drop:.1f} pts)"))
+        for inst_name, metrics in result['instruments'].items():
+            ref_metrics = reference['instruments'].get(inst_name)
+            if ref_metrics is None:
+                continue
+            inst_drop = ref_metrics['overall_score'] - metrics['overall_score']
+            if inst_drop > accuracy_tolerance:
+                regressions.append((name, f"{inst_name} score {ref_metrics['overall_score']:.1f} -> "
+                                          f"{metrics['overall_score']:.1f} (-{inst_drop:.1f} pts)"))
+    return regressions
+
+def print_results(results, previous):
+    print(f"\n{'file':<22s} {'wall':>8s} {'frames/s':>9s} {'x real':>7s} {'RSS MB':>7s} "
+          f"{'score':>6s} {'prev':>6s}  instruments (exact / P@1 / created / ref, start ms, duration ms)")
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"{name:<22s} FAILED")
+            continue
+        prev = previous.get(name)
+        prev_score = f"{prev['overall_score']:.1f}" if prev else "-"
+        print(f"{name:<22s} {result['wall_s']:>7.1f}s {result['frames_per_s']:>9.0f} {result['realtime_factor']:>6.1f}x "
+              f"{result['peak_rss_mb']:>7.0f} {result['overall_score']:>6.1f} {prev_score:>6s}")
+        for inst_name, m in result['instruments'].items():
+            print(f"{'':<22s}   {inst_name}: {m['pitch_exact']} / {m['pitch_at_1']} / {m['created_count']} / "
+                  f"{m['ref_count']}, {m['avg_start_diff']:.0f}ms, {m['avg_duration_diff']:.0f}ms, "
+                  f"score {m['overall_score']:.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end transcription regression runner")
+    parser.add_argument("--dir", default="Sounds", help="Directory of audio / reference MIDI pairs")
+    parser.add_argument("--only", nargs="+", help="Only the files whose name contains one of these words")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="History file (JSON lines)")
+    parser.add_argument("--no-record", action="store_true", help="Do not append this run to the history")
+    parser.add_argument("--speed-tolerance", type=float, default=0.25,
+                        help="Allowed wall time increase ratio before flagging (0.25 = +25%%)")
+    parser.add_argument("--accuracy-tolerance", type=float, default=1.0,
+                        help="Allowed overall score drop in points before flagging")
+    args = parser.parse_args(argv)
+
+    pairs = discover_pairs(args.dir)
+    if args.only:
+        pairs = [pair for pair in pairs if any(word in pair[0] for word in args.only)]
+    if not pairs:
+        print(f"No audio / reference MIDI pair found in {args.dir}")
+        return 1
+
+    print(f"{len(pairs)} file(s) from {args.dir}:")
+    results = run_corpus(pairs)
+
+    history = load_history(args.history)
+    previous = previous_results(history)
+    print_results(results, previous)
+
+    if not args.no_record:
+        commit, dirty = git_commit()
+        append_history(args.history, {
+            'commit': commit,
+            'dirty': dirty,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'files': results,
+        })
+        print(f"\nRun appended to {args.history} (commit {commit[:10] if commit else 'unknown'}{', dirty' if dirty else ''})")
+
+    regressions = compare(results, previous, args.speed_tolerance, args.accuracy_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for name, message in regressions:
+            print(f"  {name}: {message}")
+        return 1
+    print("\nNo regression." if previous else "\nNo previous run to compare with.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Synthetic ground-truth corpus: renders any MIDI file to audio with additive
+synthesis (HARMONIC_TEMPLATES), giving an exact (audio, reference MIDI) pair.
+
+Run from the repository root:
+    python -m benchmarks.corpus_renderer Sounds/Gamme.mid Sounds/SSB.mid --out Output/corpus
+    python -m benchmarks.corpus_renderer --random 240 --density 12 --out Output/corpus
+
+Each input gives <name>.wav and <name>.mid in the output directory. The .mid is the
+reference to use as REF_MIDI (piano tracks on program 0, trumpet tracks on program
+73, like the files written by start_conversion) and the .wav the INPUT_FILE.
+"""
+import argparse
+import os
+import re
+
+import numpy as np
+import pretty_midi
+from scipy.io import wavfile
+
+from config import HARMONIC_TEMPLATES
+from benchmarks.synthetic import SAMPLE_RATE
+
+# Output program per template, same convention as start_conversion
+TEMPLATE_PROGRAMS = {"piano": 0, "trumpet": 73}
+
+# Amplitude envelopes (seconds). Piano decays while held, trumpet sustains.
+ENVELOPES = {
+    "piano":   {'attack': 0.005, 'decay': 0.8, 'sustain': 0.0, 'release': 0.08},
+    "trumpet": {'attack': 0.03, 'decay': 0.2, 'sustain': 0.8, 'release': 0.06},
+}
+
+MAX_BATCH_SAMPLES = 4_000_000  # Bound on the (notes x samples) matrix rendered at once
+
+# Track name words rendered with the trumpet template ("1./2. tb", "Flute"...)
+TRUMPET_NAME_WORDS = {"trumpet", "trompette", "tb", "tp", "brass", "flute", "fl"}
+
+def template_for_instrument(instrument):
+    """Picks "piano" or "trumpet" from the track name / program (brass programs 56-63 and 73 -> trumpet)"""
+    words = set(re.split(r"[^a-z]+", instrument.name.lower()))
+    if words & TRUMPET_NAME_WORDS:
+        return "trumpet"
+    if 56 <= instrument.program <= 63 or instrument.program == 73:
+        return "trumpet"
+    return "piano"
+
+def note_envelopes(t, durations, template):
+    """Envelope matrix for a batch of notes, t is (1, L) seconds, durations (n, 1)"""
+    env = ENVELOPES[template]
+    attack = np.minimum(t / env['attack'], 1.0)
+    body = env['sustain'] + (1.0 - env['sustain']) * np.exp(-t / env['decay'])
+    release = np.clip(1.0 - (t - durations) / env['release'], 0.0, 1.0)
+    return attack * body * release
+
+def render_notes(starts, durations, pitches, velocities, template, sr=SAMPLE_RATE, length=None):
+    """
+    Additive synthesis of many notes at once. Notes are sorted by length and
+    rendered in batches as a (notes x samples) matrix, then scattered into the
+    output with one bincount per batch.
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    durations = np.maximum(np.asarray(durations, dtype=np.float64), 1.0 / sr)
+    freqs = 440.0 * 2.0 ** ((np.asarray(pitches, dtype=np.float64) - 69) / 12)
+    amplitudes = np.asarray(velocities, dtype=np.float64) / 127 * 0.3
+
+    release = ENVELOPES[template]['release']
+    start_samples = np.round(starts * sr).astype(np.int64)
+    note_samples = np.ceil((durations + release) * sr).astype(np.int64)
+    if length is None:
+        length = int(np.max(start_samples + note_samples)) if len(starts) else 0
+    out = np.zeros(length, dtype=np.float64)
+    if len(starts) == 0:
+        return out.astype(np.float32)
+
+    weights = np.asarray(HARMONIC_TEMPLATES[template], dtype=np.float64)
+    weights = weights / weights.sum()
+    harmonics = np.arange(1, len(weights) + 1)
+
+    order = np.argsort(note_samples)
+    i = 0
+    while i < len(order):
+        # Batch of notes with similar lengths so little padding is rendered
+        count = 1
+        while i + count < len(order) and (count + 1) * note_samples[order[i + count]] <= MAX_BATCH_SAMPLES:
+            count += 1
+        batch = order[i:i + count]
+        i += count
+        L = int(note_samples[batch].max())
+
+        t = (np.arange(L) / sr)[None, :]
+        phase = 2 * np.pi * freqs[batch, None] * t
+        wave = np.zeros((len(batch), L))
+        for number, weight in zip(harmonics, weights):
+            # Harmonics above Nyquist are dropped per note
+            audible = (freqs[batch] * number < sr / 2)[:, None]
+            wave += np.where(audible, weight * np.sin(number * phase), 0.0)
+        wave *= note_envelopes(t, durations[batch, None], template) * amplitudes[batch, None]
+
+        positions = start_samples[batch, None] + np.arange(L)[None, :]
+        valid = (np.arange(L)[None, :] < note_samples[batch, None]) & (positions < length)
+        lo = int(start_samples[batch].min())
+        hi = int(min(length, positions[valid].max() + 1))
+        out[lo:hi] += np.bincount(positions[valid] - lo, weights=wave[valid], minlength=hi - lo)
+
+    return out.astype(np.float32)
+
+def render_midi(midi, sr=SAMPLE_RATE):
+    """
+    Renders a MIDI file (path or PrettyMIDI) and returns (audio, reference PrettyMIDI).
+    Each track uses the template picked by template_for_instrument; drum tracks are skipped.
+    """
+    if isinstance(midi, str):
+        midi = pretty_midi.PrettyMIDI(midi)
+
+    length = int((midi.get_end_time() + 0.5) * sr)
+    audio = np.zeros(length, dtype=np.float32)
+    reference = pretty_midi.PrettyMIDI()
+
+    for instrument in midi.instruments:
+        if instrument.is_drum or not instrument.notes:
+            continue
+        template = template_for_instrument(instrument)
+        notes = instrument.notes
+        audio += render_notes([n.start for n in notes], [n.end - n.start for n in notes],
+                              [n.pitch for n in notes], [n.velocity for n in notes],
+                              template, sr, length)
+
+        ref_instrument = pretty_midi.Instrument(program=TEMPLATE_PROGRAMS[template], name=template.capitalize())
+        ref_instrument.notes = [pretty_midi.Note(velocity=n.velocity, pitch=n.pitch, start=n.start, end=n.end)
+                                for n in notes]
+        reference.instruments.append(ref_instrument)
+
+    peak = np.max(np.abs(audio)) if len(audio) else 0
+    if peak > 0.9:
+        audio *= 0.9 / peak
+    return audio, reference
+
+def random_midi(duration, notes_per_second=8, seed=0, templates=("piano", "trumpet")):
+    """Dense random piece for stress tests: piano chords/melody and a trumpet line"""
+    rng = np.random.default_rng(seed)
+    midi = pretty_midi.PrettyMIDI()
+    for template in templates:
+        instrument = pretty_midi.Instrument(program=TEMPLATE_PROGRAMS[template], name=template.capitalize())
+        count = int(duration * notes_per_second / len(templates))
+        starts = np.sort(rng.uniform(0, duration, count))
+        durations = rng.uniform(0.1, 1.0 if template == "piano" else 0.6, count)
+        low, high = (40, 84) if template == "piano" else (55, 82)
+        pitches = rng.integers(low, high, count)
+        velocities = rng.integers(50, 120, count)
+        for start, length, pitch, velocity in zip(starts, durations, pitches, velocities):
+            instrument.notes.append(pretty_midi.Note(velocity=int(velocity), pitch=int(pitch),
+                                                     start=float(start), end=float(min(duration, start + length))))
+        midi.instruments.append(instrument)
+    return midi
+
+def write_pair(audio, reference, out_dir, name, sr=SAMPLE_RATE):
+    """Writes <name>.wav and <name>.mid, returns both paths"""
+    os.makedirs(out_dir, exist_ok=True)
+    wav_path = os.path.join(out_dir, f"{name}.wav")
+    midi_path = os.path.join(out_dir, f"{name}.mid")
+    wavfile.write(wav_path, sr, audio)
+    reference.write(midi_path)
+    return wav_path, midi_path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render MIDI files to (audio, reference MIDI) pairs")
+    parser.add_argument("midis", nargs="*", help="MIDI files to render")
+    parser.add_argument("--out", default="Output/corpus", help="Output directory")
+    parser.add_argument("--random", type=float, metavar="SECONDS", help="Also render a random piece of this length")
+    parser.add_argument("--density", type=float, default=8, help="Notes per second of the random piece")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sr", type=int, default=SAMPLE_RATE)
+    args = parser.parse_args(argv)
+
+    jobs = [(os.path.splitext(os.path.basename(path))[0], path) for path in args.midis]
+    if args.random:
+        jobs.append((f"random_{args.random:g}s_{args.density:g}nps_seed{args.seed}",
+                     random_midi(args.random, args.density, args.seed)))
+
+    for name, midi in jobs:
+        audio, reference = render_midi(midi, args.sr)
+        wav_path, midi_path = write_pair(audio, reference, args.out, name, args.sr)
+        note_count = sum(len(inst.notes) for inst in reference.instruments)
+        print(f"{wav_path} + {midi_path}: {len(audio) / args.sr:.1f}s, {note_count} notes")
+
+if __name__ == "__main__":
+    main()
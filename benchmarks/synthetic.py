@@ -0,0 +1,109 @@
+import numpy as np
+import pretty_midi
+
+from config import HARMONIC_TEMPLATES
+
+# -------------------- Deterministic synthetic inputs --------------------
+# Every generator only depends on its arguments (noise uses a seeded RNG), so the
+# same call always gives the same signal and benchmark runs stay comparable.
+
+SAMPLE_RATE = 44100  # Same rate as the MP3s in Sounds/
+
+def _time_axis(duration, sr):
+    return np.arange(int(duration * sr)) / sr
+
+def envelope(n_samples, sr, attack=0.01, release=0.05):
+    """Linear attack / release envelope avoiding clicks at the note edges"""
+    env = np.ones(n_samples, dtype=np.float32)
+    attack_n = min(n_samples, int(attack * sr))
+    release_n = min(n_samples - attack_n, int(release * sr))
+    if attack_n > 0:
+        env[:attack_n] = np.linspace(0.0, 1.0, attack_n, endpoint=False)
+    if release_n > 0:
+        env[n_samples - release_n:] = np.linspace(1.0, 0.0, release_n)
+    return env
+
+def sine(freq, duration, sr=SAMPLE_RATE, amplitude=0.5):
+    """Pure sine tone"""
+    t = _time_axis(duration, sr)
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+def harmonic_tone(freq, duration, instrument="piano", sr=SAMPLE_RATE, amplitude=0.5):
+    """Additive tone using the harmonic amplitudes of HARMONIC_TEMPLATES[instrument]"""
+    t = _time_axis(duration, sr)
+    template = np.asarray(HARMONIC_TEMPLATES[instrument], dtype=np.float64)
+    harmonics = np.arange(1, len(template) + 1)
+    audible = harmonics * freq < sr / 2  # Skip harmonics above Nyquist
+    harmonics, template = harmonics[audible], template[audible]
+
+    y = np.zeros(len(t))
+    for number, weight in zip(harmonics, template):
+        y += weight * np.sin(2 * np.pi * freq * number * t)
+    y *= amplitude / max(np.sum(template), 1e-9)
+    return (y * envelope(len(t), sr)).astype(np.float32)
+
+def chord(midi_notes, duration, instrument="piano", sr=SAMPLE_RATE, amplitude=0.5):
+    """Several harmonic tones played together"""
+    y = sum(harmonic_tone(pretty_midi.note_number_to_hz(note), duration, instrument, sr, amplitude)
+            for note in midi_notes)
+    return (y / max(len(midi_notes), 1)).astype(np.float32)
+
+def silence(duration, sr=SAMPLE_RATE):
+    return np.zeros(int(duration * sr), dtype=np.float32)
+
+def noise(duration, sr=SAMPLE_RATE, amplitude=0.1, seed=0):
+    """Seeded white noise"""
+    rng = np.random.default_rng(seed)
+    return (amplitude * rng.standard_normal(int(duration * sr))).astype(np.float32)
+
+def note_sequence(duration, instrument="piano", sr=SAMPLE_RATE, note_length=0.25, seed=0):
+    """Melody of random notes (C3-C6) with occasional two-note chords"""
+    rng = np.random.default_rng(seed)
+    y = silence(duration, sr)
+    n_notes = int(duration / note_length)
+    for i in range(n_notes):
+        notes = [int(rng.integers(48, 84))]
+        if rng.random() < 0.3:
+            notes.append(notes[0] + int(rng.choice([3, 4, 7])))
+        segment = chord(notes, note_length, instrument, sr)
+        start = int(i * note_length * sr)
+        y[start:start + len(segment)] += segment[:len(y) - start]
+    return y
+
+# name -> generator(duration) used by the benchmark suite
+SIGNALS = {
+    "sine": lambda duration: sine(440.0, duration),
+    "piano_tone": lambda duration: harmonic_tone(261.63, duration, "piano"),
+    "trumpet_tone": lambda duration: harmonic_tone(466.16, duration, "trumpet"),
+    "chord": lambda duration: chord([60, 64, 67], duration, "piano"),
+    "piano_sequence": lambda duration: note_sequence(duration, "piano"),
+    "trumpet_sequence": lambda duration: note_sequence(duration, "trumpet", seed=1),
+    "silence": lambda duration: silence(duration),
+    "noise": lambda duration: noise(duration),
+}
+
+def synthetic_note_pairs(count, seed=0, start_jitter=0.03, pitch_error_rate=0.2):
+    """
+    Reference notes and "transcribed" notes derived from them (jittered starts,
+    some wrong pitches, a few extra notes), as pretty_midi.Note lists for the comparator.
+    """
+    rng = np.random.default_rng(seed)
+    starts = np.cumsum(rng.uniform(0.05, 0.3, count))
+    durations = rng.uniform(0.1, 0.8, count)
+    pitches = rng.integers(48, 84, count)
+
+    ref_notes = [pretty_midi.Note(velocity=100, pitch=int(p), start=float(s), end=float(s + d))
+                 for s, d, p in zip(starts, durations, pitches)]
+
+    created_notes = []
+    for note in ref_notes:
+        start = max(0.0, note.start + rng.normal(0, start_jitter))
+        pitch = note.pitch + (int(rng.choice([-12, -1, 1, 12])) if rng.random() < pitch_error_rate else 0)
+        created_notes.append(pretty_midi.Note(velocity=100, pitch=pitch, start=start,
+                                              end=start + (note.end - note.start) * rng.uniform(0.7, 1.3)))
+    for _ in range(count // 10):  # Over-detections
+        start = float(rng.uniform(0, starts[-1]))
+        created_notes.append(pretty_midi.Note(velocity=100, pitch=int(rng.integers(48, 84)),
+                                              start=start, end=start + 0.2))
+    created_notes.sort(key=lambda n: n.start)
+    return ref_notes, created_notes
@@ -5,12 +5,19 @@ OUTPUT_PIANO_MIDI = "Output/detected_notes0.mid"      # File name and path of th
 OUTPUT_TRUMPET_MIDI = "Output/detected_notes73.mid"
 OUTPUT_BOTH_MIDI = "Output/detected_notesboth.mid"
 REF_MIDI = "Sounds/Gamme.mid"
+COMPARATOR_REPORT_FILE = "Output/comparator_report.png"  # Comparator graphs written by main.py
+PIPELINE_CACHE_FILE = "Output/.pipeline_cache.json"      # Hashes of the main.py stages (delete to run everything)
+DECODE_CACHE_DIR = "Output/.decode_cache"               # Decoded audio reused by midi_generator (None to decode every time)
 
 # -------------------- Processing Mode Configuration --------------------
 ENABLE_GRAPH_ANIMATION = False  # Set to True for visual analysis, False for faster processing
 
 # -------------------- Animation Parameters --------------------
 FPS = 30  # Frames per second for animation (if enabled)
+RENDER_SEED = 0  # Random seed of the offline render (render_video.py): same seed, same frames
+STAR_ROTATION_STEPS = 64  # Star rotations per turn: sprites of the atlas, redraws of the cached static star layer
+STAR_TRAIL_STEPS = 128    # Trail sprites per turn of the move angle
+STAR_ATLAS_MAX_MB = 32    # Memory budget of the star sprites, the rotation / trail steps are halved to fit
 
 # -------------------- Enhanced Harmonic Templates --------------------
 # Key insight: Piano harmonics decay rapidly, trumpet has formant-boosted mid harmonics
@@ -91,15 +98,29 @@ MIDI_TEMPO_BPM = 120         # Standard tempo
 MIDI_VELOCITY_MIN = 64       # Conservative velocity range
 MIDI_VELOCITY_MAX = 127      # Full velocity range
 MIDI_PROGRAM = 0             # Acoustic Grand Piano
+STREAMING_MIDI_EXPORT = False               # Write notes while processing (flat memory for long recordings)
+STREAMING_STRENGTH_RANGE = (0.12, 2.0)      # Strength mapped to velocity_min..velocity_max when streaming
+MIDI_NPZ_CACHE = True                       # Cache parsed MIDI files as <file>.npz next to them (midi_loader)
+
+# -------------------- MIDI Comparator Parameters --------------------
+COMPARATOR_ONE_TO_ONE = False       # Also match notes one-to-one (optimal assignment) and report precision / recall / F1
+COMPARATOR_ONSET_WINDOW = 0.05      # Max start difference (s) of a one-to-one match
+COMPARATOR_PITCH_TOLERANCE = 0      # Max pitch difference (semitones) of a one-to-one match
+COMPARATOR_FRAME_RESOLUTION = 0.01  # Frame length (s) of the piano-rolls used by the frame-level metrics
 
 # -------------------- Debug and Analysis Options --------------------
-VERBOSE_LOGGING = True              # Keep logging for debugging
+VERBOSE_LOGGING = True              # DEBUG level on the console (per-note dumps, FPS), INFO otherwise
+LOG_JSON_FILE = None                # e.g. "Output/run_log.jsonl" to also write structured JSON lines
+LOG_PROGRESS_INTERVAL_S = 1.0       # Minimum time between progress/FPS messages in frame loops
 SAVE_INTERMEDIATE_RESULTS = False   # Don't save unless debugging
 PLOT_FREQUENCY_RESPONSE = False     # Don't plot unless debugging
 
 # -------------------- Performance Monitoring --------------------
 ENABLE_TIMING_ANALYSIS = True       # Track performance
 MEMORY_USAGE_MONITORING = False     # Only if needed
+TIMING_REPORT_FILE = "Output/timing_report.json"  # JSON report of the stage timings
+DETECTION_FUNNEL_ANALYSIS = False   # Per-frame note_detection counters (peaks, candidates, rejections)
+DETECTION_FUNNEL_REPORT_FILE = "Output/detection_funnel.json"
 
 # -------------------- Quality Control Parameters --------------------
 # These are crucial for preventing false positives
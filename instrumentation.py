@@ -0,0 +1,293 @@
+import heapq
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from config import ENABLE_TIMING_ANALYSIS, MEMORY_USAGE_MONITORING
+
+# -------------------- Stage timing & memory instrumentation --------------------
+# Usage:
+#     timer = StageTimer()
+#     with timer.stage("cqt"):
+#         ...                        # big, non nested stage
+#     for frame in frames:
+#         with timer.accumulate("detection"):
+#             ...                    # hot loop, summed over all calls
+#     timer.save_report("Output/timing_report.json")
+#     print(timer.summary())
+#
+# When both ENABLE_TIMING_ANALYSIS and MEMORY_USAGE_MONITORING are off, stage()
+# and accumulate() return a shared do-nothing context manager.
+
+def peak_rss_mb():
+    """Peak resident memory of the process in MB (None if it can't be measured)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS reports bytes
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _StageSpan:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        if self.timer.memory:
+            self.trace_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record = {
+            'name': self.name,
+            'wall_s': time.perf_counter() - self.wall_start,
+            'cpu_s': time.process_time() - self.cpu_start,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        if self.timer.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            record['tracemalloc_delta_mb'] = (current - self.trace_start) / (1024 * 1024)
+            record['tracemalloc_peak_mb'] = (peak - self.trace_start) / (1024 * 1024)
+        self.timer.stages.append(record)
+        return False
+
+class _AccumulatingSpan:
+    def __init__(self, record):
+        self.record = record
+
+    def __enter__(self):
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.record['wall_s'] += time.perf_counter() - self.wall_start
+        self.record['cpu_s'] += time.process_time() - self.cpu_start
+        self.record['calls'] += 1
+        return False
+
+class StageTimer:
+    """Collects named stage spans (wall time, CPU time, peak RSS, tracemalloc deltas) for one run"""
+    def __init__(self, label="", enabled=ENABLE_TIMING_ANALYSIS, memory=MEMORY_USAGE_MONITORING):
+        self.label = label
+        self.memory = memory
+        self.enabled = enabled or memory
+        self.stages = []          # Ordered list of stage records
+        self.accumulators = {}    # name -> accumulated record (hot loop stages)
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.started_tracemalloc = False
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+    def stage(self, name):
+        """Context manager timing one stage. Stages should not be nested (tracemalloc peak is reset)"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _StageSpan(self, name)
+
+    def accumulate(self, name):
+        """Context manager summing wall/CPU time over many calls, for per-frame work"""
+        if not self.enabled:
+            return _NULL_SPAN
+        record = self.accumulators.get(name)
+        if record is None:
+            record = {'name': name, 'wall_s': 0.0, 'cpu_s': 0.0, 'calls': 0}
+            self.accumulators[name] = record
+            self.stages.append(record)
+        return _AccumulatingSpan(record)
+
+    def stop(self):
+        """Stop memory tracing if this timer started it"""
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+    def report(self):
+        """Whole run as a JSON-serializable dict"""
+        return {
+            'label': self.label,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'total_wall_s': time.perf_counter() - self.start_wall,
+            'total_cpu_s': time.process_time() - self.start_cpu,
+            'peak_rss_mb': peak_rss_mb(),
+            'memory_monitoring': self.memory,
+            'stages': self.stages,
+        }
+
+    def save_report(self, path):
+        """Write the JSON report, does nothing when disabled"""
+        if not self.enabled:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def summary(self):
+        """One line summary of the run"""
+        if not self.enabled:
+            return ""
+        parts = [f"{stage['name']} {stage['wall_s']:.2f}s" for stage in self.stages]
+        line = f"Timing: {' | '.join(parts)} | total {time.perf_counter() - self.start_wall:.2f}s"
+        rss = peak_rss_mb()
+        if rss is not None:
+            line += f" (peak RSS {rss:.0f} MB)"
+        return line
+
+# Shared disabled timer, used as default argument by the pipeline functions
+NULL_TIMER = StageTimer(enabled=False, memory=False)
+
+# -------------------- Detection funnel (per-frame note_detection counters) --------------------
+# Follows every frame through note_detection: raw peaks -> supported peaks ->
+# fundamental candidates -> quality rules -> duplicate removal, with the time
+# spent in each function. Only the slowest frames keep a copy of their spectrum.
+
+QUALITY_RULE_NAMES = {
+    1: 'energy_threshold',
+    2: 'harmonics_or_energy',
+    3: 'harmonic_strength',
+    4: 'frequency_range',
+    5: 'pattern_score',
+    6: 'high_freq_evidence',
+    7: 'low_freq_support',
+}
+
+FUNNEL_COUNTERS = ('raw_peaks', 'supported_peaks', 'fundamental_candidates',
+                   'accepted', 'duplicates_removed', 'detected')
+
+class _FunctionSpan:
+    def __init__(self, funnel, name):
+        self.funnel = funnel
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        frame_times = self.funnel.frame['function_time_s']
+        frame_times[self.name] = frame_times.get(self.name, 0.0) + elapsed
+        return False
+
+def timed(funnel, name):
+    """Time a call inside the current frame of the funnel, no-op when funnel is None"""
+    if funnel is None:
+        return _NULL_SPAN
+    return _FunctionSpan(funnel, name)
+
+class DetectionFunnel:
+    """Aggregates per-frame detection counters into a per-file report"""
+    def __init__(self, label="", keep_slowest=10):
+        self.label = label
+        self.keep_slowest = keep_slowest
+        self.frequencies = None
+        self.frame_count = 0
+        self.totals = {}          # counter -> sum over all frames
+        self.histograms = {}      # counter -> {value: number of frames}
+        self.rejections = {name: 0 for name in QUALITY_RULE_NAMES.values()}
+        self.function_time_s = {}
+        self.total_time_s = 0.0
+        self.slowest = []         # min-heap of (duration, frame_index, frame record)
+        self.frame = None
+        self.spectrum = None
+
+    def begin_frame(self, frame_time, spectrum, frequencies=None):
+        if self.frequencies is None and frequencies is not None:
+            self.frequencies = [float(f) for f in frequencies]
+        self.spectrum = spectrum
+        self.frame = {'time': frame_time, 'counters': dict.fromkeys(FUNNEL_COUNTERS, 0),
+                      'rejections': {}, 'function_time_s': {}}
+        self.frame_start = time.perf_counter()
+
+    def count(self, counter, value):
+        self.frame['counters'][counter] = value
+
+    def reject(self, rule):
+        name = QUALITY_RULE_NAMES[rule]
+        rejections = self.frame['rejections']
+        rejections[name] = rejections.get(name, 0) + 1
+
+    def end_frame(self):
+        duration = time.perf_counter() - self.frame_start
+        frame = self.frame
+        frame['duration_ms'] = duration * 1000
+        self.frame_count += 1
+        self.total_time_s += duration
+
+        for counter, value in frame['counters'].items():
+            self.totals[counter] = self.totals.get(counter, 0) + value
+            histogram = self.histograms.setdefault(counter, {})
+            histogram[value] = histogram.get(value, 0) + 1
+        for name, value in frame['rejections'].items():
+            self.rejections[name] += value
+        for name, value in frame['function_time_s'].items():
+            self.function_time_s[name] = self.function_time_s.get(name, 0.0) + value
+
+        # Keep only the slowest frames (and their spectrum)
+        if len(self.slowest) < self.keep_slowest or duration > self.slowest[0][0]:
+            frame['spectrum'] = [float(v) for v in self.spectrum]
+            entry = (duration, self.frame_count, frame)
+            if len(self.slowest) < self.keep_slowest:
+                heapq.heappush(self.slowest, entry)
+            else:
+                heapq.heapreplace(self.slowest, entry)
+        self.frame = None
+        self.spectrum = None
+
+    def report(self):
+        slowest = [entry[2] for entry in sorted(self.slowest, key=lambda e: e[0], reverse=True)]
+        return {
+            'label': self.label,
+            'frames': self.frame_count,
+            'total_time_s': self.total_time_s,
+            'avg_frame_ms': self.total_time_s / self.frame_count * 1000 if self.frame_count else 0,
+            'totals': self.totals,
+            'rejections': self.rejections,
+            'function_time_s': self.function_time_s,
+            'histograms': {counter: {str(value): frames for value, frames in sorted(histogram.items())}
+                           for counter, histogram in self.histograms.items()},
+            'slowest_frames': slowest,
+            'frequencies': self.frequencies,
+        }
+
+    def save_report(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def summary(self):
+        if not self.frame_count:
+            return "Detection funnel: no frames"
+        funnel = " -> ".join(f"{counter} {total}" for counter, total in self.totals.items())
+        slowest = max(self.slowest, key=lambda e: e[0])[2]
+        return (f"Detection funnel ({self.frame_count} frames, avg {self.total_time_s / self.frame_count * 1000:.2f}ms): "
+                f"{funnel} | slowest frame {slowest['time']:.2f}s ({slowest['duration_ms']:.2f}ms)")
@@ -1,12 +1,50 @@
 from animation import *
 from mp3_to_midi import *
 from midi_part.midi_comparator import *
+from pipeline import Pipeline, Stage, config_values
 from config import INPUT_FILE, OUTPUT_PIANO_MIDI, OUTPUT_TRUMPET_MIDI, OUTPUT_BOTH_MIDI, REF_MIDI
+from config import COMPARATOR_REPORT_FILE, PIPELINE_CACHE_FILE
 
-start_conversion()
+# Settings read by the transcription (mp3_to_midi, audio_process, note_detection, Note):
+# paths, logging, reports, caches and animation-only settings are left out of its cache key.
+# FPS sets the hop length of the CQT analysis (audio_process.compute_hop_length).
+TRANSCRIPTION_SETTINGS = (
+    'FPS', 'FREQ_MIN', 'FREQ_MAX', 'BINS_PER_OCTAVE', 'N_OCTAVES', 'CQT_FILTER_SCALE', 'CQT_SPARSITY',
+    'MIN_PEAK_HEIGHT', 'PEAK_PROMINENCE', 'MAX_HARMONICS', 'HARMONIC_TOLERANCE', 'HARMONIC_WEIGHT_DECAY',
+    'HARMONIC_TEMPLATES', 'DETECTION_THRESHOLD', 'SMOOTHING_TIME', 'MIN_NOTE_DURATION',
+    'MIDI_TEMPO_BPM', 'MIDI_VELOCITY_MIN', 'MIDI_VELOCITY_MAX', 'MIDI_PROGRAM',
+    'STREAMING_MIDI_EXPORT', 'STREAMING_STRENGTH_RANGE',
+)
+
+pipeline = Pipeline(PIPELINE_CACHE_FILE)
+
+# Audio -> piano / trumpet MIDI, redone when the audio, the detection code or its settings change
+pipeline.add(Stage("transcribe",
+                   lambda: start_conversion(INPUT_FILE, OUTPUT_PIANO_MIDI, OUTPUT_TRUMPET_MIDI),
+                   inputs=[INPUT_FILE, "mp3_to_midi.py", "audio_process.py", "note_detection.py", "Note.py",
+                           "instrumentation.py", "midi_part/midi_writer.py"],
+                   outputs=[OUTPUT_PIANO_MIDI, OUTPUT_TRUMPET_MIDI],
+                   config=config_values(TRANSCRIPTION_SETTINGS)))
 
 # # # When both instruments
-combine_midis(OUTPUT_PIANO_MIDI, OUTPUT_TRUMPET_MIDI, OUTPUT_BOTH_MIDI)
-generate_graph(REF_MIDI, [OUTPUT_BOTH_MIDI])
+pipeline.add(Stage("combine",
+                   lambda: combine_midis(OUTPUT_PIANO_MIDI, OUTPUT_TRUMPET_MIDI, OUTPUT_BOTH_MIDI),
+                   inputs=[OUTPUT_PIANO_MIDI, OUTPUT_TRUMPET_MIDI, "midi_part/midi_combinator.py",
+                           "midi_part/midi_loader.py", "midi_part/midi_writer.py"],
+                   outputs=[OUTPUT_BOTH_MIDI]))
+
+# The comparator report and the animation data only need the combined MIDI: they run concurrently
+pipeline.add(Stage("report",
+                   lambda: save_graph(REF_MIDI, [OUTPUT_BOTH_MIDI], COMPARATOR_REPORT_FILE),
+                   inputs=[REF_MIDI, OUTPUT_BOTH_MIDI, "midi_part/midi_comparator.py", "midi_part/midi_loader.py"],
+                   outputs=[COMPARATOR_REPORT_FILE],
+                   config={name: value for name, value in config_values().items() if name.startswith('COMPARATOR_')}))
+
+pipeline.add(Stage("animation_prep",
+                   lambda: prepare_animation(OUTPUT_BOTH_MIDI),
+                   inputs=[OUTPUT_BOTH_MIDI]))
+
+status = pipeline.run()
 
-start_animation(INPUT_FILE, OUTPUT_BOTH_MIDI)
\ No newline at end of file
+if status["animation_prep"] == 'ran':
+    start_animation(INPUT_FILE, OUTPUT_BOTH_MIDI, pipeline.results["animation_prep"])
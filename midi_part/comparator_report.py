@@ -0,0 +1,129 @@
+"""
+Rapport du comparateur sans affichage : graphiques PNG + métriques JSON / CSV.
+
+Depuis la racine du dépôt :
+    python -m midi_part.comparator_report --compare Sounds/Gamme.mid Output/detected_notesboth.mid \\
+        --compare Sounds/Ecossaise_Beethoven.mid Output/E_v1.mid Output/E_v2.mid --out Output/report
+
+Chaque --compare donne une référence suivie de ses fichiers candidats. Les couples
+(référence, candidat) sont évalués en parallèle dans des processus ; chaque référence
+donne <out>/<référence>_report.png (les cinq graphiques de generate_graph), et toutes
+les métriques FileData sont écrites dans <out>/metrics.json et <out>/metrics.csv.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")  # Pas d'affichage : utilisable en batch / CI
+
+from config import COMPARATOR_ONE_TO_ONE
+from midi_part import midi_comparator
+from midi_part.midi_loader import load_midi
+
+# Colonnes des fichiers de métriques, dans l'ordre
+METRIC_COLUMNS = ('ref_count', 'created_count', 'pitch_exact', 'pitch_at_1', 'avg_start_diff',
+                  'avg_duration_diff', 'overall_score', 'precision', 'recall', 'f1',
+                  'frame_precision', 'frame_recall', 'frame_accuracy')
+
+_references = {}  # Références déjà lues par ce processus
+
+def evaluate_pair(ref_path, candidate_path, one_to_one=COMPARATOR_ONE_TO_ONE):
+    """FileData de chaque instrument d'un candidat, [(nom d'instrument, FileData)] ou le message d'erreur"""
+    try:
+        if ref_path not in _references:
+            _references[ref_path] = load_midi(ref_path)
+        return midi_comparator.compare_midi(_references[ref_path], candidate_path, one_to_one)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+def evaluate_all(groups, workers=None, one_to_one=COMPARATOR_ONE_TO_ONE):
+    """
+    groups : [(référence, [candidats])]. Retourne {référence: {candidat: résultat de evaluate_pair}}.
+    """
+    pairs = [(ref, candidate) for ref, candidates in groups for candidate in candidates]
+    results = {ref: {} for ref, _ in groups}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(evaluate_pair, ref, candidate, one_to_one) for ref, candidate in pairs]
+        for (ref, candidate), future in zip(pairs, futures):
+            results[ref][candidate] = future.result()
+    return results
+
+def metric_rows(results):
+    """Une ligne par (référence, candidat, instrument)"""
+    rows = []
+    for ref, candidates in results.items():
+        for candidate, datas in candidates.items():
+            if isinstance(datas, str):
+                rows.append({'reference': ref, 'candidate': candidate, 'instrument': None, 'error': datas})
+                continue
+            for inst_name, data in datas:
+                row = {'reference': ref, 'candidate': candidate, 'instrument': inst_name}
+                row.update({column: getattr(data, column) for column in METRIC_COLUMNS})
+                rows.append(row)
+    return rows
+
+def write_metrics(rows, out_dir):
+    json_path = os.path.join(out_dir, "metrics.json")
+    csv_path = os.path.join(out_dir, "metrics.csv")
+    with open(json_path, 'w') as f:
+        json.dump(rows, f, indent=2, default=float)
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=('reference', 'candidate', 'instrument') + METRIC_COLUMNS + ('error',))
+        writer.writeheader()
+        writer.writerows(rows)
+    return json_path, csv_path
+
+def write_graphs(comparator, ref, candidates, out_dir):
+    """PNG des cinq graphiques pour une référence, None s'il n'y a aucune donnée"""
+    datas = {}
+    for datas_of_candidate in candidates.values():
+        if isinstance(datas_of_candidate, str):
+            continue
+        for inst_name, data in datas_of_candidate:
+            datas.setdefault(inst_name, []).append(data)
+    if not datas:
+        return None
+
+    name = os.path.splitext(os.path.basename(ref))[0]
+    path = os.path.join(out_dir, f"{name}_report.png")
+    comparator.plot(datas, midi_comparator.Figure()).savefig(path, dpi=100)
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rapport du comparateur MIDI sans affichage")
+    parser.add_argument("--compare", nargs="+", action="append", required=True, metavar="MIDI",
+                        help="Référence suivie de ses candidats (répétable)")
+    parser.add_argument("--out", default="Output/report", help="Dossier du rapport")
+    parser.add_argument("--workers", type=int, help="Processus d'évaluation (défaut : nombre de CPU)")
+    parser.add_argument("--one-to-one", action="store_true", default=COMPARATOR_ONE_TO_ONE,
+                        help="Ajoute précision / rappel / F1 de l'appariement un-pour-un")
+    args = parser.parse_args(argv)
+
+    groups = []
+    for group in args.compare:
+        if len(group) < 2:
+            parser.error("--compare attend une référence et au moins un candidat")
+        groups.append((group[0], group[1:]))
+
+    os.makedirs(args.out, exist_ok=True)
+    results = evaluate_all(groups, args.workers, args.one_to_one)
+
+    comparator = midi_comparator.Comparator(args.one_to_one)  # Mêmes couleurs de fichier sur tous les rapports
+    for ref, candidates in results.items():
+        for candidate, datas in candidates.items():
+            if isinstance(datas, str):
+                print(f"Erreur lors du traitement de {candidate}: {datas}")
+        path = write_graphs(comparator, ref, candidates, args.out)
+        print(f"{ref}: {path}" if path else f"{ref}: aucune donnée à tracer")
+
+    rows = metric_rows(results)
+    json_path, csv_path = write_metrics(rows, args.out)
+    print(f"Métriques : {json_path}, {csv_path}")
+    return 1 if any('error' in row for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,137 @@
-import pretty_midi
+"""
+Merges any number of MIDI files / note arrays into one MIDI file.
+
+    python -m midi_part.midi_combinator Output/piano.mid Output/trumpet.mid Output/voice.mid -o Output/all.mid
+    python -m midi_part.midi_combinator stems/*.mid -o Output/all.mid --by-program
+
+Every instrument of every input becomes a track of the output (in input order),
+or with --by-program the instruments sharing a program are merged into one track.
+The output is written like pretty_midi's PrettyMIDI.write (type 1, 220 ticks per
+beat at 120 BPM, same channels and event order) but straight from the note
+arrays: the note events of a track are produced by a k-way heap merge of its
+sorted onset / offset streams, without creating any Note or mido message.
+"""
+import argparse
+import heapq
+import sys
+
+import numpy as np
+
+from config import MIDI_NPZ_CACHE
+from midi_part.midi_loader import MidiNotes, load_midi
+from midi_part.midi_writer import encode_variable_length, header_chunk, meta_event, track_chunk
+
+OUTPUT_RESOLUTION = 220   # pretty_midi defaults
+OUTPUT_TEMPO_BPM = 120.0
+
+def _source_instruments(source, use_cache):
+    """(name, program, is_drum, note_array) of each instrument of a path, MidiNotes or NOTE_DTYPE array"""
+    if isinstance(source, np.ndarray):
+        instruments = []
+        for index in np.unique(source['instrument']):
+            notes = source[source['instrument'] == index]
+            instruments.append(('', int(notes['program'][0]), bool(notes['channel'][0] == 9), notes))
+        return instruments
+    if not isinstance(source, MidiNotes):
+        source = load_midi(source, use_cache=use_cache)
+    return [(inst.name, inst.program, inst.is_drum, inst.note_array) for inst in source.instruments]
+
+def collect_tracks(sources, by_program=False, use_cache=MIDI_NPZ_CACHE):
+    """[(name, program, is_drum, [note arrays])], one per output track"""
+    tracks = []
+    by_key = {}
+    for source in sources:
+        for name, program, is_drum, notes in _source_instruments(source, use_cache):
+            key = (program, is_drum)
+            if by_program and key in by_key:
+                by_key[key][3].append(notes)
+                continue
+            track = (name, program, is_drum, [notes])
+            by_key.setdefault(key, track)
+            tracks.append(track)
+    return tracks
+
+def times_to_ticks(times, tick_scale):
+    """PrettyMIDI.time_to_tick of a file with a single tempo: round half to even, negative times at 0"""
+    return np.where(times > 0, np.rint(times / tick_scale), 0).astype(np.int64)
+
+def _sorted_events(ticks, pitches, velocities):
+    order = np.lexsort((velocities, pitches, ticks))
+    return zip(ticks[order].tolist(), pitches[order].tolist(), velocities[order].tolist())
+
+def note_events(note_arrays, tick_scale):
+    """
+    (tick, pitch, velocity) note_on events of a track, note-offs having velocity 0.
+    Order of PrettyMIDI.write: tick, then pitch, then velocity (a note-off before a
+    note-on of the same pitch and tick).
+    """
+    streams = []
+    for notes in note_arrays:
+        pitches = notes['pitch'].astype(np.int64)
+        streams.append(_sorted_events(times_to_ticks(notes['start'], tick_scale), pitches,
+                                      notes['velocity'].astype(np.int64)))
+        streams.append(_sorted_events(times_to_ticks(notes['end'], tick_scale), pitches,
+                                      np.zeros(len(notes), dtype=np.int64)))
+    return heapq.merge(*streams)
+
+def _timing_track(tempo_bpm):
+    tempo = int(6e7 / tempo_bpm)
+    data = bytearray()
+    data += b'\x00' + meta_event(0x51, tempo.to_bytes(3, 'big'))
+    data += b'\x00' + meta_event(0x58, bytes((4, 2, 24, 8)))   # 4/4
+    data += b'\x01' + meta_event(0x2F, b'')
+    return track_chunk(data)
+
+def _instrument_track(name, program, channel, events):
+    data = bytearray()
+    if name:
+        data += b'\x00' + meta_event(0x03, name.encode('latin1'))
+    data += bytes((0x00, 0xC0 | channel, program))
+    last_tick = 0
+    status = 0x90 | channel
+    running = False   # Running status: the status byte is written once
+    for tick, pitch, velocity in events:
+        data += encode_variable_length(tick - last_tick)
+        if not running:
+            data.append(status)
+            running = True
+        data.append(pitch)
+        data.append(velocity)
+        last_tick = tick
+    data += b'\x01' + meta_event(0x2F, b'')
+    return track_chunk(data)
+
+def merge_midis(sources, output_file_path, by_program=False, use_cache=MIDI_NPZ_CACHE):
+    """
+    Writes the instruments of sources (MIDI paths, MidiNotes or NOTE_DTYPE arrays)
+    as the tracks of output_file_path. Returns the number of instrument tracks.
+    """
+    tracks = collect_tracks(sources, by_program, use_cache)
+    tick_scale = 60.0 / (OUTPUT_TEMPO_BPM * OUTPUT_RESOLUTION)
+    channels = [channel for channel in range(16) if channel != 9]   # Never the drum channel by mistake
+
+    with open(output_file_path, 'wb') as f:
+        f.write(header_chunk(len(tracks) + 1, OUTPUT_RESOLUTION))
+        f.write(_timing_track(OUTPUT_TEMPO_BPM))
+        for n, (name, program, is_drum, note_arrays) in enumerate(tracks):
+            channel = 9 if is_drum else channels[n % len(channels)]
+            f.write(_instrument_track(name, program, channel, note_events(note_arrays, tick_scale)))
+    return len(tracks)
 
 def combine_midis(piano_file_path, trumpet_file_path, output_file_path):
-    midi_files = [
-        pretty_midi.PrettyMIDI(piano_file_path),
-        pretty_midi.PrettyMIDI(trumpet_file_path)
-    ]
-    combined = pretty_midi.PrettyMIDI()
-
-    for midi_file in midi_files:
-        instrument = pretty_midi.Instrument(program=midi_file.instruments[0].program)
-        for note in midi_file.instruments[0].notes:
-            midi_note = pretty_midi.Note(
-                velocity=note.velocity,
-                pitch=note.pitch,
-                start=note.start,
-                end=note.end
-            )
-            instrument.notes.append(midi_note)
-        combined.instruments.append(instrument)
-
-    combined.write(output_file_path)
\ No newline at end of file
+    # Files just written by the transcription: no .npz cache
+    merge_midis([piano_file_path, trumpet_file_path], output_file_path, use_cache=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge MIDI files into one multi-track MIDI file")
+    parser.add_argument("inputs", nargs="+", help="MIDI files, their instruments are kept in this order")
+    parser.add_argument("-o", "--output", required=True, help="Merged MIDI file")
+    parser.add_argument("--by-program", action="store_true", help="One track per program instead of per instrument")
+    args = parser.parse_args(argv)
+
+    count = merge_midis(args.inputs, args.output, args.by_program)
+    print(f"{count} track(s) written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
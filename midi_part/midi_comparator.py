@@ -1,11 +1,17 @@
-import pretty_midi
+import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 
-midi_ref = None
-midis_file_path = []
-instruments = []
-midis = {}
-file_colors = {}
+from config import COMPARATOR_ONE_TO_ONE, COMPARATOR_ONSET_WINDOW, COMPARATOR_PITCH_TOLERANCE, COMPARATOR_FRAME_RESOLUTION
+from midi_part.midi_loader import load_midi
+from Utils.log_utils import get_logger
+
+logger = get_logger('midi_comparator')
+
+MAX_FRAMES = 1 << 40  # Trames par pitch dans les codes de frame_cells
 
 class FileData:
     def __init__(self, name):
@@ -17,39 +23,230 @@ class FileData:
         self.avg_duration_diff = 0
         self.avg_start_diff = 0
         self.overall_score = 0
+        self.precision = None   # Renseignés par l'appariement un-pour-un (COMPARATOR_ONE_TO_ONE)
+        self.recall = None
+        self.f1 = None
+        self.frame_precision = 0    # Piano-roll à COMPARATOR_FRAME_RESOLUTION
+        self.frame_recall = 0
+        self.frame_accuracy = 0
+        self.frame_pitch_metrics = {}   # {pitch: (précision, rappel, exactitude)}
         self.color = None
 
-def get_file_color(name):
-    if name not in file_colors:
-        idx = len(file_colors) % 10
-        file_colors[name] = plt.cm.tab10(idx / 10)
-    return file_colors[name]
+def note_arrays(notes):
+    """(starts, ends, pitches) des notes sous forme de tableaux NumPy"""
+    starts = np.array([n.start for n in notes], dtype=np.float64)
+    ends = np.array([n.end for n in notes], dtype=np.float64)
+    pitches = np.array([n.pitch for n in notes], dtype=np.int64)
+    return starts, ends, pitches
+
+def instrument_arrays(instrument):
+    """note_arrays d'un instrument, directement depuis le tableau de notes de midi_loader s'il y en a un"""
+    note_array = getattr(instrument, 'note_array', None)
+    if note_array is None:
+        return note_arrays(instrument.notes)
+    return note_array['start'], note_array['end'], note_array['pitch'].astype(np.int64)
+
+def candidate_pairs(ref_starts, created_starts, tol, order=None):
+    """
+    Tous les couples (note créée, note de référence) dont les débuts sont à tol près,
+    trouvés par fenêtres np.searchsorted sur les débuts de référence triés.
+    Retourne deux tableaux d'indices (created, ref).
+    """
+    if order is None:
+        order = np.argsort(ref_starts, kind='stable')
+    sorted_starts = ref_starts[order]
+
+    # Fenêtres un peu élargies puis filtrées avec le même test que la boucle
+    # d'origine (abs(début - début) <= tol)
+    margin = tol * 1e-9 + 1e-12
+    lo = np.searchsorted(sorted_starts, created_starts - tol - margin, side='left')
+    hi = np.searchsorted(sorted_starts, created_starts + tol + margin, side='right')
+
+    counts = hi - lo
+    pair_created = np.repeat(np.arange(len(created_starts)), counts)
+    pair_sorted = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+    pair_ref = order[pair_sorted]
+    inside = np.abs(ref_starts[pair_ref] - created_starts[pair_created]) <= tol
+    return pair_created[inside], pair_ref[inside]
+
+def match_note_indices(ref_starts, ref_pitches, created_starts, created_pitches, tol=0.05):
+    """
+    Version tableaux de pre_traitement_notes : indice de la note de référence associée
+    à chaque note créée.
+    Parmi les références dont le début est à tol près, on prend le pitch le plus proche,
+    sinon le début le plus proche. En cas d'égalité, la première dans l'ordre de référence.
+    """
+    if len(created_starts) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if len(ref_starts) == 0:
+        raise ValueError("Aucune note de référence")
+
+    # Débuts triés ; tri stable => à début égal, l'ordre de référence est conservé
+    order = np.argsort(ref_starts, kind='stable')
+    sorted_starts = ref_starts[order]
+    pair_created, pair_ref = candidate_pairs(ref_starts, created_starts, tol, order)
+
+    matched = np.full(len(created_starts), -1, dtype=np.int64)
+    if len(pair_ref):
+        # Par note créée : plus petit écart de pitch, puis plus petit indice de référence
+        pitch_diff = np.abs(ref_pitches[pair_ref] - created_pitches[pair_created])
+        best = np.lexsort((pair_ref, pitch_diff, pair_created))
+        first = np.ones(len(best), dtype=bool)
+        first[1:] = pair_created[best[1:]] != pair_created[best[:-1]]
+        matched[pair_created[best[first]]] = pair_ref[best[first]]
+
+    missing = np.flatnonzero(matched < 0)
+    if len(missing):
+        # Pas de candidat : début le plus proche (voisins gauche / droite du point d'insertion)
+        starts = created_starts[missing]
+        pos = np.searchsorted(sorted_starts, starts, side='left')
+        # Première note (plus petit indice) de chaque groupe de débuts égaux
+        run_start = np.flatnonzero(np.r_[True, sorted_starts[1:] != sorted_starts[:-1]])
+        run_first = order[run_start]
+        run_of = np.cumsum(np.r_[True, sorted_starts[1:] != sorted_starts[:-1]]) - 1
+
+        left = np.clip(pos - 1, 0, len(order) - 1)
+        right = np.clip(pos, 0, len(order) - 1)
+        d_left = np.where(pos > 0, np.abs(sorted_starts[left] - starts), np.inf)
+        d_right = np.where(pos < len(order), np.abs(sorted_starts[right] - starts), np.inf)
+        left_ref = run_first[run_of[left]]
+        right_ref = run_first[run_of[right]]
+
+        matched[missing] = np.where(d_left < d_right, left_ref,
+                                    np.where(d_right < d_left, right_ref, np.minimum(left_ref, right_ref)))
+    return matched
 
 def pre_traitement_notes(notes_ref, notes_created, tol=0.05):
     """
     Associe chaque note du fichier créé avec une note du fichier de référence.
     Retourne un tableau de même taille que notes_created.
     """
-    matched = []
-
-    for note_c in notes_created:
-        candidates = [n for n in notes_ref if abs(n.start - note_c.start) <= tol]
-
-        if not candidates:
-            best_ref = min(notes_ref, key=lambda n: abs(n.start - note_c.start))
-        else:
-            best_ref = min(candidates, key=lambda n: abs(n.pitch - note_c.pitch))
-
-        matched.append(best_ref)
-
-    return matched
+    ref_starts, _, ref_pitches = note_arrays(notes_ref)
+    created_starts, _, created_pitches = note_arrays(notes_created)
+    indices = match_note_indices(ref_starts, ref_pitches, created_starts, created_pitches, tol)
+    return [notes_ref[i] for i in indices]
 
-def get_num_pitch_difference(error_margin, created_notes, matched_notes):
+def one_to_one_matches(ref, created, onset_window=0.05, pitch_tolerance=0, duration_weight=0.1):
+    """
+    Appariement optimal un-pour-un : chaque note de référence et chaque note créée
+    sont utilisées au plus une fois.
+    ref / created sont des (starts, ends, pitches). Seuls les couples dont les débuts sont
+    à onset_window près et les pitchs à pitch_tolerance près sont possibles. On maximise
+    le nombre de couples, puis on minimise le coût (écart de début, de pitch et de durée).
+    Le graphe des couples possibles est découpé en composantes connexes, résolues
+    séparément avec linear_sum_assignment.
+    Retourne deux tableaux d'indices (created, ref) des couples retenus.
+    """
+    ref_starts, ref_ends, ref_pitches = ref
+    created_starts, created_ends, created_pitches = created
+    n_created, n_ref = len(created_starts), len(ref_starts)
+    empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    if n_created == 0 or n_ref == 0:
+        return empty
+
+    pair_created, pair_ref = candidate_pairs(ref_starts, created_starts, onset_window)
+    pitch_diff = np.abs(ref_pitches[pair_ref] - created_pitches[pair_created])
+    keep = pitch_diff <= pitch_tolerance
+    pair_created, pair_ref, pitch_diff = pair_created[keep], pair_ref[keep], pitch_diff[keep]
+    if len(pair_created) == 0:
+        return empty
+
+    # Coût de chaque couple, entre 0 et 2 + duration_weight
+    ref_durations = ref_ends[pair_ref] - ref_starts[pair_ref]
+    created_durations = created_ends[pair_created] - created_starts[pair_created]
+    cost = (np.abs(ref_starts[pair_ref] - created_starts[pair_created]) / max(onset_window, 1e-9)
+            + pitch_diff / (pitch_tolerance + 1)
+            + duration_weight * np.minimum(1.0, np.abs(created_durations - ref_durations) / np.maximum(ref_durations, 1e-3)))
+
+    # Composantes connexes du graphe biparti (notes créées 0..n-1, références n..n+m-1)
+    graph = coo_matrix((np.ones(len(pair_created)), (pair_created, n_created + pair_ref)),
+                       shape=(n_created + n_ref, n_created + n_ref))
+    _, labels = connected_components(graph, directed=False)
+    edge_labels = labels[pair_created]
+    edges_per_block = np.bincount(edge_labels)
+
+    # Composantes d'un seul couple : rien à résoudre
+    single = edges_per_block[edge_labels] == 1
+    matched_created = [pair_created[single]]
+    matched_ref = [pair_ref[single]]
+
+    multi = np.flatnonzero(~single)
+    multi = multi[np.argsort(edge_labels[multi], kind='stable')]
+    bounds = np.flatnonzero(np.diff(edge_labels[multi])) + 1
+    for block in np.split(multi, bounds):
+        if len(block) == 0:
+            continue
+        rows, row_idx = np.unique(pair_created[block], return_inverse=True)
+        cols, col_idx = np.unique(pair_ref[block], return_inverse=True)
+        # Couple impossible : plus cher que n'importe quel ensemble de couples possibles,
+        # ce qui fait d'abord maximiser le nombre de couples
+        impossible = (2 + duration_weight) * min(len(rows), len(cols)) + 1
+        matrix = np.full((len(rows), len(cols)), impossible)
+        matrix[row_idx, col_idx] = cost[block]
+        assigned_rows, assigned_cols = linear_sum_assignment(matrix)
+        valid = matrix[assigned_rows, assigned_cols] < impossible
+        matched_created.append(rows[assigned_rows[valid]])
+        matched_ref.append(cols[assigned_cols[valid]])
+
+    return np.concatenate(matched_created), np.concatenate(matched_ref)
+
+def precision_recall_f1(matched_count, created_count, ref_count):
+    """Précision, rappel et F1 en % pour matched_count couples un-pour-un"""
+    precision = matched_count / created_count * 100 if created_count else 0
+    recall = matched_count / ref_count * 100 if ref_count else 0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0
+    return precision, recall, f1
+
+def frame_cells(starts, ends, pitches, resolution):
+    """
+    Piano-roll creux : codes pitch * MAX_FRAMES + trame des cases actives, triés et uniques.
+    Une note occupe les trames f telles que start <= f * resolution < end.
+    """
+    first = np.ceil(starts / resolution).astype(np.int64)
+    last = np.ceil(ends / resolution).astype(np.int64)  # exclu
+    counts = np.maximum(last - first, 0)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    frames = np.repeat(first, counts) + offsets
+    cells = np.repeat(pitches, counts) * MAX_FRAMES + frames
+    cells.sort()
+    # Cases couvertes par plusieurs notes du même pitch comptées une fois
+    return cells[np.r_[True, cells[1:] != cells[:-1]]] if len(cells) else cells
+
+def frame_metrics(ref, created, resolution=0.01):
+    """
+    Précision, rappel et exactitude (TP / (TP + FP + FN)) en % des piano-rolls
+    ref / created ((starts, ends, pitches)), au total et par pitch.
+    Retourne (precision, recall, accuracy, {pitch: (precision, recall, accuracy)}).
+    """
+    ref_cells = frame_cells(*ref, resolution)
+    created_cells = frame_cells(*created, resolution)
+    hits = np.intersect1d(ref_cells, created_cells, assume_unique=True)
+
+    def scores(tp, ref_count, created_count):
+        precision = tp / created_count * 100 if created_count else 0
+        recall = tp / ref_count * 100 if ref_count else 0
+        union = ref_count + created_count - tp
+        accuracy = tp / union * 100 if union else 0
+        return precision, recall, accuracy
+
+    size = 128
+    ref_per_pitch = np.bincount(ref_cells // MAX_FRAMES, minlength=size)
+    created_per_pitch = np.bincount(created_cells // MAX_FRAMES, minlength=size)
+    hits_per_pitch = np.bincount(hits // MAX_FRAMES, minlength=size)
+    per_pitch = {int(pitch): scores(int(hits_per_pitch[pitch]), int(ref_per_pitch[pitch]), int(created_per_pitch[pitch]))
+                 for pitch in np.flatnonzero(ref_per_pitch + created_per_pitch)}
+
+    return scores(len(hits), len(ref_cells), len(created_cells)) + (per_pitch,)
+
+def get_num_pitch_difference(error_margin, created_pitches, matched_pitches):
     """
     Retourne le nombre de notes qui ont + ou - une marge d'erreur de pitch
     """
-    return sum(abs(created_notes[i].pitch - matched_notes[i].pitch) <= error_margin
-              for i in range(len(created_notes)))
+    return int(np.count_nonzero(np.abs(created_pitches - matched_pitches) <= error_margin))
+
+def sequential_sum(values):
+    """Somme de gauche à droite, comme sum() : mêmes arrondis que l'ancienne boucle"""
+    return float(np.cumsum(values)[-1]) if len(values) else 0
 
 def plot_bar_with_annotations(ax, labels, values, title="", ylabel="", ylim=None, fmt="{:.0f}", colors=None):
     bars = ax.bar(labels, values, color=colors)
@@ -85,6 +282,7 @@ def generate_nb_notes_graph(axes, midis):
                                   ylabel="Notes", colors=colors)
 
 def generate_avg_duration_diff_graph(axes, midis):
+    nbInst = len(midis)
     for i, (inst_name, files) in enumerate(midis.items()):
         # Utiliser la dernière colonne disponible
         rowPos = 2 if nbInst > 1 else 1
@@ -110,6 +308,7 @@ def generate_avg_duration_diff_graph(axes, midis):
         )
 
 def generate_avg_start_diff_graph(axes, midis):
+    nbInst = len(midis)
     # Utiliser la dernière colonne disponible
     for i, (inst_name, files) in enumerate(midis.items()):
         if i >= axes.shape[1]:
@@ -136,6 +335,7 @@ def generate_avg_start_diff_graph(axes, midis):
         )
 
 def generate_pitch_graph(axes, midis):
+    nbInst = len(midis)
     for j, (inst_name, files) in enumerate(midis.items()):
         if j >= axes.shape[1]:
             break
@@ -177,6 +377,7 @@ def generate_pitch_graph(axes, midis):
                         ha="center", va="bottom", fontsize=8)
 
 def generate_overall_match_graph(axes, midis):
+    nbInst = len(midis)
     for i, (inst_name, files) in enumerate(midis.items()):
         if i >= axes.shape[1]:
             break
@@ -186,6 +387,13 @@ def generate_overall_match_graph(axes, midis):
         values = [data.overall_score for data in files]
         colors = [data.color for data in files]
 
+        # Précision / rappel / F1 de l'appariement un-pour-un, à côté du score global
+        for data in files:
+            if data.f1 is not None:
+                names += [f"{data.name}_P", f"{data.name}_R", f"{data.name}_F1"]
+                values += [data.precision, data.recall, data.f1]
+                colors += [data.color] * 3
+
         plot_bar_with_annotations(ax, names, values,
                                 title=f"{inst_name} - Matching global",
                                 ylabel="%",
@@ -193,117 +401,184 @@ def generate_overall_match_graph(axes, midis):
                                 fmt="{:.1f}%",
                                 colors=colors)
 
-def get_datas():
-    
+def compare_midi(midi_ref, midi_path, one_to_one=COMPARATOR_ONE_TO_ONE):
+    """
+    Compare un fichier MIDI créé à la référence (MidiNotes de midi_loader ou PrettyMIDI).
+    Retourne une liste de (nom de l'instrument de référence, FileData), sans couleur ni graphique.
+    one_to_one ajoute précision / rappel / F1 de l'appariement un-pour-un.
+    """
     # Poids pour le calcul du score global
     w_pitch = 0.4
     w_notes = 0.3
     w_start = 0.2
     w_duration = 0.1
 
-    # Traitement des fichiers MIDI
-    for midi_path in midis_file_path:
-        try:
-            midi_data = pretty_midi.PrettyMIDI(midi_path)
-            midi_name = midi_path.split('/')[-1].replace('.mid', '')
-
-            for inst_ref in midi_ref.instruments:
-                # Chercher l'instrument correspondant
-                inst_created = None
-                for inst in midi_data.instruments:
-                    if inst.program == inst_ref.program or inst.name == inst_ref.name:
-                        inst_created = inst
-                        break
-                
-                if not inst_created or not inst_created.notes:
-                    continue
-
-                ref_notes = inst_ref.notes
-                created_notes = inst_created.notes
-                created_count = len(created_notes)
-                ref_count = len(ref_notes)
-
-                if created_count == 0:
-                    continue
-
-                # Match des notes
-                equivalent_notes_midi = pre_traitement_notes(ref_notes, created_notes)
-
-                # Calcul des métriques
-                score_notes = (created_count / ref_count * 100) if ref_count else 0
-
-                note_pitch_exact = get_num_pitch_difference(0, created_notes, equivalent_notes_midi)
-                note_pitch_at_1 = get_num_pitch_difference(1, created_notes, equivalent_notes_midi)
-                note_pitch_at_12 = get_num_pitch_difference(12, created_notes, equivalent_notes_midi)
-                score_pitch = (note_pitch_exact / created_count * 100) if created_count else 0
-
-                starts_diff = sum(abs(created_notes[i].start - equivalent_notes_midi[i].start) 
-                                for i in range(len(created_notes)))
-                duration_diff = sum(abs((created_notes[i].end - created_notes[i].start) - 
-                                    (equivalent_notes_midi[i].end - equivalent_notes_midi[i].start))
-                                for i in range(len(created_notes)))
-
-                avg_start_diff_ms = (starts_diff / created_count * 1000) if created_count else 0
-                avg_duration_diff_ms = (duration_diff / created_count * 1000) if created_count else 0
-
-                # Calcul des scores (limités entre 0 et 100)
-                score_start = max(0, min(100, 100 - avg_start_diff_ms / 10))  # Ajusté la division
-                score_duration = max(0, min(100, 100 - avg_duration_diff_ms / 100))  # Ajusté la division
-
-                score_global = (
-                    w_notes * min(score_notes, 100) +
-                    w_pitch * score_pitch +
-                    w_start * score_start +
-                    w_duration * score_duration
-                )
-
-                # Création de l'objet FileData
-                data = FileData(midi_name)
-                data.created_count = created_count
-                data.avg_duration_diff = avg_duration_diff_ms
-                data.avg_start_diff = avg_start_diff_ms
-                data.pitch_at_1 = note_pitch_at_1
-                data.pitch_exact = note_pitch_exact
-                data.ref_count = ref_count
-                data.overall_score = score_global
-                data.color = get_file_color(midi_name)
-                
-                midis.setdefault(inst_ref.name, []).append(data)
-
-        except Exception as e:
-            print(f"Erreur lors du traitement de {midi_path}: {e}")
-
-    # Vérification qu'il y a des données à traiter
-    if not midis:
-        print("Aucune donnée à traiter. Vérifiez les chemins des fichiers MIDI.")
-        exit()
-        
-def init_graphs():
-    global fig, axes, nbInst
-    nbInst = len(midis.keys())
-    
-    if nbInst == 1:
-        fig, axes = plt.subplots(3, 2, figsize=(18, 15))
-        axes[-1, -1].remove()  # Supprimer le subplot vide
-    else:
-        fig, axes = plt.subplots(5, nbInst, figsize=(5*nbInst, 12))
-        
+    results = []
+    midi_data = load_midi(midi_path)
+    midi_name = midi_path.split('/')[-1].replace('.mid', '')
+
+    for inst_ref in midi_ref.instruments:
+        # Chercher l'instrument correspondant
+        inst_created = None
+        for inst in midi_data.instruments:
+            if inst.program == inst_ref.program or inst.name == inst_ref.name:
+                inst_created = inst
+                break
+
+        if not inst_created:
+            continue
+
+        ref_starts, ref_ends, ref_pitches = instrument_arrays(inst_ref)
+        created_starts, created_ends, created_pitches = instrument_arrays(inst_created)
+        created_count = len(created_starts)
+        ref_count = len(ref_starts)
+
+        if created_count == 0:
+            continue
+
+        # Match des notes
+        matched = match_note_indices(ref_starts, ref_pitches, created_starts, created_pitches)
+
+        # Calcul des métriques
+        score_notes = (created_count / ref_count * 100) if ref_count else 0
+
+        matched_pitches = ref_pitches[matched]
+        note_pitch_exact = get_num_pitch_difference(0, created_pitches, matched_pitches)
+        note_pitch_at_1 = get_num_pitch_difference(1, created_pitches, matched_pitches)
+        note_pitch_at_12 = get_num_pitch_difference(12, created_pitches, matched_pitches)
+        score_pitch = (note_pitch_exact / created_count * 100) if created_count else 0
+
+        starts_diff = sequential_sum(np.abs(created_starts - ref_starts[matched]))
+        duration_diff = sequential_sum(np.abs((created_ends - created_starts) -
+                                              (ref_ends[matched] - ref_starts[matched])))
+
+        avg_start_diff_ms = (starts_diff / created_count * 1000) if created_count else 0
+        avg_duration_diff_ms = (duration_diff / created_count * 1000) if created_count else 0
+
+        # Calcul des scores (limités entre 0 et 100)
+        score_start = max(0, min(100, 100 - avg_start_diff_ms / 10))  # Ajusté la division
+        score_duration = max(0, min(100, 100 - avg_duration_diff_ms / 100))  # Ajusté la division
+
+        score_global = (
+            w_notes * min(score_notes, 100) +
+            w_pitch * score_pitch +
+            w_start * score_start +
+            w_duration * score_duration
+        )
+
+        # Création de l'objet FileData
+        data = FileData(midi_name)
+        data.created_count = created_count
+        data.avg_duration_diff = avg_duration_diff_ms
+        data.avg_start_diff = avg_start_diff_ms
+        data.pitch_at_1 = note_pitch_at_1
+        data.pitch_exact = note_pitch_exact
+        data.ref_count = ref_count
+        data.overall_score = score_global
+
+        (data.frame_precision, data.frame_recall, data.frame_accuracy,
+         data.frame_pitch_metrics) = frame_metrics((ref_starts, ref_ends, ref_pitches),
+                                                   (created_starts, created_ends, created_pitches),
+                                                   COMPARATOR_FRAME_RESOLUTION)
+
+        if one_to_one:
+            pairs_created, _ = one_to_one_matches((ref_starts, ref_ends, ref_pitches),
+                                                  (created_starts, created_ends, created_pitches),
+                                                  COMPARATOR_ONSET_WINDOW, COMPARATOR_PITCH_TOLERANCE)
+            data.precision, data.recall, data.f1 = precision_recall_f1(len(pairs_created), created_count, ref_count)
+
+        results.append((inst_ref.name, data))
+
+    return results
+
+class Comparator:
+    """
+    Compare des fichiers MIDI créés à une référence.
+    L'état (couleurs des fichiers, dernière figure) appartient à l'instance :
+    plusieurs appels ou plusieurs comparateurs ne se mélangent pas.
+    """
+    def __init__(self, one_to_one=COMPARATOR_ONE_TO_ONE):
+        self.one_to_one = one_to_one
+        self.file_colors = {}
+        self.fig = None
+        self.axes = None
+
+    def evaluate(self, midi_ref, midi_file_paths):
+        """
+        Métriques de chaque fichier, sans effet de bord.
+        midi_ref : chemin, MidiNotes ou PrettyMIDI. Retourne {nom d'instrument: [FileData]}, vide si aucune donnée.
+        """
+        if isinstance(midi_ref, str):
+            midi_ref = load_midi(midi_ref)
+
+        datas = {}
+        for midi_path in midi_file_paths:
+            try:
+                for inst_name, data in compare_midi(midi_ref, midi_path, self.one_to_one):
+                    datas.setdefault(inst_name, []).append(data)
+            except Exception as e:
+                logger.error("Erreur lors du traitement de %s: %s", midi_path, e)
+        return datas
+
+    def get_file_color(self, name):
+        if name not in self.file_colors:
+            idx = len(self.file_colors) % 10
+            self.file_colors[name] = plt.cm.tab10(idx / 10)
+        return self.file_colors[name]
+
+    def init_graphs(self, nbInst, figure=None):
+        """Crée les axes avec pyplot, ou dans figure (matplotlib.figure.Figure) si donnée"""
+        if nbInst == 1:
+            rows, cols, figsize = 3, 2, (18, 15)
+        else:
+            rows, cols, figsize = 5, nbInst, (5*nbInst, 12)
+
+        if figure is None:
+            self.fig, self.axes = plt.subplots(rows, cols, figsize=figsize)
+        else:
+            self.fig = figure
+            self.fig.set_size_inches(*figsize)
+            self.axes = self.fig.subplots(rows, cols)
+
+        if nbInst == 1:
+            self.axes[-1, -1].remove()  # Supprimer le subplot vide
+
+    def plot(self, datas, figure=None):
+        """Dessine les cinq graphiques des données de evaluate(), retourne la figure"""
+        for files in datas.values():
+            for data in files:
+                data.color = self.get_file_color(data.name)
+
+        self.init_graphs(len(datas), figure)
+
+        # Génération des graphiques
+        generate_nb_notes_graph(self.axes, datas)
+        generate_avg_duration_diff_graph(self.axes, datas)
+        generate_avg_start_diff_graph(self.axes, datas)
+        generate_pitch_graph(self.axes, datas)
+        generate_overall_match_graph(self.axes, datas)
+
+        self.fig.tight_layout()
+        return self.fig
+
 def generate_graph(midi_ref_path, midi_file_path):
-    global midi_ref, midis_file_path
-    midi_ref = pretty_midi.PrettyMIDI(midi_ref_path)
-    midis_file_path = midi_file_path
-
-    get_datas()
-    
-    init_graphs()
-    
-    # Génération des graphiques
-    generate_nb_notes_graph(axes, midis)
-    generate_avg_duration_diff_graph(axes, midis)
-    generate_avg_start_diff_graph(axes, midis)
-    generate_pitch_graph(axes, midis)
-    generate_overall_match_graph(axes, midis)
-
-    plt.tight_layout()
+    comparator = Comparator()
+    datas = comparator.evaluate(midi_ref_path, midi_file_path)
+    if not datas:
+        logger.error("Aucune donnée à traiter. Vérifiez les chemins des fichiers MIDI.")
+        return
+    comparator.plot(datas)
     plt.show()
-    
+
+def save_graph(midi_ref_path, midi_file_path, output_file):
+    """
+    Même rapport que generate_graph, enregistré dans output_file (PNG...).
+    N'utilise pas pyplot : peut tourner hors du thread principal.
+    """
+    comparator = Comparator()
+    datas = comparator.evaluate(midi_ref_path, midi_file_path)
+    if not datas:
+        logger.error("Aucune donnée à traiter. Vérifiez les chemins des fichiers MIDI.")
+        return None
+    comparator.plot(datas, Figure()).savefig(output_file, dpi=100)
+    return output_file
@@ -1,101 +1,118 @@
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
 import librosa
-import pretty_midi
 import numpy as np
-import os
 
-def audio_to_midi():
+from config import DECODE_CACHE_DIR
+from midi_part.midi_combinator import merge_midis
+from midi_part.midi_loader import NOTE_DTYPE
+from Utils.log_utils import get_logger
+
+logger = get_logger('midi_generator')
+
+CHROMA_SR = 22050       # Sample rate of the chroma analysis (librosa default)
+N_FFT = 2048
+HOP_LENGTH = 512
+VELOCITY = 100          # Normalized MIDI velocity
+
+def instrument_program(file_path):
+    filename = os.path.basename(file_path).lower()
+    if 'piano' in filename:
+        return 0  # Acoustic Grand Piano
+    elif 'trumpet' in filename:
+        return 73  # Trumpet
+    return 0  # Default to piano
+
+def decode_audio(file_path, sr=CHROMA_SR, cache_dir=DECODE_CACHE_DIR):
     """
-    Convert an audio file to MIDI format by extracting chromatic notes.
+    Mono signal of file_path at sr. The decoded signal is kept in cache_dir (one .npy
+    per file, sample rate, size and modification time), shared by every process.
     """
-    notes_by_instruments = {}
-    
-    for file_path in file_paths:
-        # Load the audio file 
-        # y = audio signal, sr = sample rate in Hz (default 22050Hz)
-        y, sr = librosa.load(path=file_path)
-        
-        # Detect note onset frames using backtracking for better accuracy
-        onset_frames = librosa.onset.onset_detect(y=y, sr=sr, backtrack=True)
-        
-        # Extract chromatic features using Short-Time Fourier Transform
-        chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-        
-        # Process each detected onset to extract note information
-        notes = []
-        prev_time = 0
-        
-        for i, onset in enumerate(onset_frames):
-        
-            # Get chroma values at this onset
-            chroma_at_onset = chroma[:, onset]
-            
-            # Find the dominant note (strongest chroma value)
-            note_pitch = chroma_at_onset.argmax()
-            
-            # Convert frame to time
-            onset_time = librosa.frames_to_time(onset, sr=sr)
-            
-            # Set normalized MIDI velocity
-            velocity = 100
-            
-            # Calculate note duration (time until next onset or use current time for first note)
-            if i == 0:
-                duration = onset_time
-            else:
-                duration = onset_time - prev_time
-                
-            notes.append((note_pitch, onset_time, duration, velocity))
-            prev_time = onset_time
-        notes_by_instruments[file_path] = notes
-    return notes_by_instruments
-
-def generate_midi(notes_by_instruments):
-    midi_file = pretty_midi.PrettyMIDI()
-    
-    for file_path, notes in notes_by_instruments.items():
-        filename = os.path.basename(file_path).lower()
-        
-        if 'piano' in filename:
-            instrument_program = 0  # Acoustic Grand Piano
-        elif 'trumpet' in filename:
-            instrument_program = 73  # Trumpet
-        else:
-            instrument_program = 0  # Default to piano
-            
-        # Create MIDI file
-        instrument = pretty_midi.Instrument(program=instrument_program)
-        
-        # Add notes to instrument
-        for pitch, onset, duration, velocity in notes:
-            # Add 60 to pitch to get proper MIDI note number (C4 = 60)
-            midi_note = pretty_midi.Note(
-                velocity=velocity,
-                pitch=pitch + 60,
-                start=onset,
-                end=onset + duration
-            )
-            instrument.notes.append(midi_note)
-        
-        # Add instrument to MIDI file
-        midi_file.instruments.append(instrument)
-        
-    # Generate output filename based on input filename
-    base_name = "all"
-    output_filename = f"./Sounds/{base_name}_converted.mid"
-    
-    # Write MIDI file
-    midi_file.write(output_filename)
-    
-    print(f"MIDI file created: {output_filename}")
-    print(f"Number of notes extracted: {len(notes)}")# Create MIDI file
-    
+    if cache_dir is None:
+        return librosa.load(path=file_path, sr=sr)[0]
+
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{sr}"
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    cached = os.path.join(cache_dir, f"{name}-{hashlib.sha1(key.encode()).hexdigest()[:16]}.npy")
+    if os.path.exists(cached):
+        return np.load(cached)
+
+    y, _ = librosa.load(path=file_path, sr=sr)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Written under a temporary name, unique per call: a worker never reads a half-written file
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(cached) + '.', suffix='.tmp', dir=cache_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, y)
+        os.replace(tmp_path, cached)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return y
+
+def transcribe_file(file_path, sr=CHROMA_SR, cache_dir=DECODE_CACHE_DIR):
+    """
+    Notes of one audio file as a NOTE_DTYPE array: one note per onset, its pitch
+    being the dominant chroma at the onset (octave 4).
+    """
+    y = decode_audio(file_path, sr, cache_dir)
+
+    # One power spectrogram for both steps (onset_detect and chroma_stft would each compute it)
+    S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH)) ** 2
+
+    # Detect note onset frames using backtracking for better accuracy
+    onset_envelope = librosa.onset.onset_strength(S=librosa.power_to_db(librosa.feature.melspectrogram(S=S, sr=sr)), sr=sr)
+    onset_frames = librosa.onset.onset_detect(onset_envelope=onset_envelope, sr=sr, hop_length=HOP_LENGTH, backtrack=True)
+
+    # Tuning estimated on the whole spectrogram (as chroma_stft does), chroma of the onset frames only
+    tuning = librosa.estimate_tuning(S=S, sr=sr, bins_per_octave=12)
+    chroma = librosa.filters.chroma(sr=sr, n_fft=N_FFT, tuning=tuning, n_chroma=12) @ S[:, onset_frames]
+
+    # Dominant note (strongest chroma value); +60 = C4
+    onset_times = librosa.frames_to_time(onset_frames, sr=sr, hop_length=HOP_LENGTH)
+    notes = np.zeros(len(onset_frames), dtype=NOTE_DTYPE)
+    notes['pitch'] = chroma.argmax(axis=0) + 60
+    notes['start'] = onset_times
+    # Duration: time since the previous onset (the onset time for the first note)
+    notes['end'] = onset_times + np.diff(onset_times, prepend=0.0)
+    notes['velocity'] = VELOCITY
+    notes['program'] = instrument_program(file_path)
+    return notes
+
+def audio_to_midi(file_paths, workers=None, sr=CHROMA_SR, cache_dir=DECODE_CACHE_DIR):
+    """
+    Convert audio files to notes by extracting chromatic notes, files processed in
+    parallel (workers processes, default: one per CPU). Returns {file path: NOTE_DTYPE array}.
+    """
+    if len(file_paths) <= 1 or workers == 1:
+        return {file_path: transcribe_file(file_path, sr, cache_dir) for file_path in file_paths}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(transcribe_file, file_path, sr, cache_dir) for file_path in file_paths]
+        return {file_path: future.result() for file_path, future in zip(file_paths, futures)}
+
+def generate_midi(notes_by_instruments, output_filename="./Sounds/all_converted.mid"):
+    """One track per file, in the order of notes_by_instruments"""
+    merge_midis(list(notes_by_instruments.values()), output_filename)
+
+    logger.info("MIDI file created: %s", output_filename)
+    logger.info("Number of notes extracted: %s", sum(len(notes) for notes in notes_by_instruments.values()))
+
 def print_notes(notes):
-    for pitch, onset, duration, velocity in notes:
-        print(f"{pitch}\t{onset:.2f}\t{duration:.2f}\t\t{velocity}")
+    for note in notes:
+        logger.debug("%s\t%.2f\t%.2f\t\t%s", note['pitch'], note['start'], note['end'] - note['start'], note['velocity'])
+
 # Example usage
 if __name__ == "__main__":
     file_paths = ["./Sounds/Ecossaise_Trumpet.mp3","./Sounds/Ecossaise_Piano.mp3"]
-    
-    notes_by_instruments = audio_to_midi()
+
+    notes_by_instruments = audio_to_midi(file_paths)
     # print_notes(notes)
-    generate_midi(notes_by_instruments)
\ No newline at end of file
+    generate_midi(notes_by_instruments)
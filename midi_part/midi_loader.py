@@ -0,0 +1,297 @@
+import hashlib
+import os
+import struct
+import tempfile
+import zipfile
+
+import numpy as np
+import pretty_midi
+
+from config import MIDI_NPZ_CACHE
+from Utils.log_utils import get_logger
+
+logger = get_logger('midi_loader')
+
+# -------------------- Fast MIDI loader --------------------
+# Reads a Standard MIDI File straight into one structured array of notes, with
+# the same notes, times and instrument grouping as pretty_midi.PrettyMIDI (tempo
+# map from track 0, one instrument per (program, channel, track), same note-off
+# pairing), without building a mido message per event.
+# The result is cached next to the file as <file>.npz, checked against the
+# file's size / mtime and, when those changed, against its content hash.
+
+NOTE_DTYPE = np.dtype([
+    ('start', np.float64),
+    ('end', np.float64),
+    ('pitch', np.int16),
+    ('velocity', np.int16),
+    ('program', np.int16),
+    ('track', np.int16),
+    ('channel', np.int16),
+    ('instrument', np.int32),   # Index in MidiNotes.instruments
+])
+
+CACHE_VERSION = 1
+
+class InstrumentNotes:
+    """One instrument of MidiNotes, usable where a pretty_midi.Instrument is read"""
+    def __init__(self, name, program, is_drum, note_array):
+        self.name = name
+        self.program = program
+        self.is_drum = is_drum
+        self.note_array = note_array
+        self._notes = None
+
+    @property
+    def notes(self):
+        """pretty_midi.Note list, built on first access"""
+        if self._notes is None:
+            self._notes = to_pretty_notes(self.note_array)
+        return self._notes
+
+    def get_end_time(self):
+        return float(self.note_array['end'].max()) if len(self.note_array) else 0.
+
+class MidiNotes:
+    """Notes of a MIDI file: notes (structured NOTE_DTYPE array) and per-instrument views"""
+    def __init__(self, notes, names, programs, is_drums, end_time):
+        self.notes = notes
+        self.end_time = end_time
+        self.instruments = [InstrumentNotes(name, int(program), bool(is_drum), notes[notes['instrument'] == i])
+                            for i, (name, program, is_drum) in enumerate(zip(names, programs, is_drums))]
+
+    def get_end_time(self):
+        return self.end_time
+
+def to_pretty_notes(note_array):
+    return [pretty_midi.Note(velocity=int(n['velocity']), pitch=int(n['pitch']), start=float(n['start']), end=float(n['end']))
+            for n in note_array]
+
+def _read_variable_length(data, pos):
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+# Data bytes of the channel messages, by status high nibble
+_DATA_LENGTH = {0x8: 2, 0x9: 2, 0xA: 2, 0xB: 2, 0xC: 1, 0xD: 1, 0xE: 2}
+
+def _read_tracks(data):
+    """(ticks_per_beat, [events per track]); an event is (tick, kind, a, b, c)"""
+    if data[:4] != b'MThd':
+        raise ValueError("Not a Standard MIDI File")
+    header_length = struct.unpack('>I', data[4:8])[0]
+    _, n_tracks, ticks_per_beat = struct.unpack('>HHh', data[8:14])
+    pos = 8 + header_length
+
+    tracks = []
+    while pos + 8 <= len(data) and len(tracks) < n_tracks:
+        chunk_type = data[pos:pos + 4]
+        length = struct.unpack('>I', data[pos + 4:pos + 8])[0]
+        start, end = pos + 8, min(pos + 8 + length, len(data))
+        pos = pos + 8 + length
+        if chunk_type != b'MTrk':
+            continue
+
+        events = []
+        tick = 0
+        status = 0
+        i = start
+        while i < end:
+            delta, i = _read_variable_length(data, i)
+            tick += delta
+            byte = data[i]
+            if byte == 0xFF:
+                meta_type = data[i + 1]
+                size, i = _read_variable_length(data, i + 2)
+                events.append((tick, 'meta', meta_type, data[i:i + size], None))
+                i += size
+            elif byte in (0xF0, 0xF7):
+                size, i = _read_variable_length(data, i + 1)
+                i += size
+            else:
+                if byte & 0x80:
+                    status = byte
+                    i += 1
+                # else: running status, byte is the first data byte
+                length = _DATA_LENGTH[status >> 4]
+                events.append((tick, status >> 4, status & 0x0F, data[i], data[i + 1] if length == 2 else None))
+                i += length
+        tracks.append(events)
+    return ticks_per_beat, tracks
+
+def _tick_scales(track0, resolution):
+    """Tempo changes of track 0 as [(tick, seconds per tick)], like PrettyMIDI._load_tempo_changes"""
+    scales = [(0, 60.0 / (120.0 * resolution))]
+    for tick, kind, meta_type, payload, _ in track0:
+        if kind == 'meta' and meta_type == 0x51 and len(payload) == 3:
+            tempo = (payload[0] << 16) | (payload[1] << 8) | payload[2]
+            scale = 60.0 / ((6e7 / tempo) * resolution)
+            if tick == 0:
+                scales = [(0, 60.0 / ((6e7 / tempo) * resolution))]
+            elif scale != scales[-1][1]:
+                scales.append((tick, scale))
+    return scales
+
+def _ticks_to_times(ticks, scales):
+    """Same arithmetic as PrettyMIDI.__tick_to_time: last_end_time + tick_scale * (tick - start_tick)"""
+    scale_ticks = np.array([tick for tick, _ in scales], dtype=np.int64)
+    scale_values = np.array([scale for _, scale in scales])
+    segment_starts = np.zeros(len(scales))
+    for k in range(1, len(scales)):
+        segment_starts[k] = segment_starts[k - 1] + scale_values[k - 1] * (scale_ticks[k] - scale_ticks[k - 1])
+    ticks = np.asarray(ticks, dtype=np.int64)
+    segment = np.searchsorted(scale_ticks, ticks, side='right') - 1
+    return segment_starts[segment] + scale_values[segment] * (ticks - scale_ticks[segment])
+
+def parse_midi(path):
+    """Parses path, returns a MidiNotes"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    resolution, tracks = _read_tracks(data)
+    if not tracks:
+        raise ValueError(f"No track in {path}")
+    scales = _tick_scales(tracks[0], resolution)
+
+    rows = []               # (start tick, end tick, pitch, velocity, program, track, channel, instrument)
+    instrument_keys = {}    # (program, channel, track) -> instrument index, in creation order
+    instruments = []        # (name, program, is_drum, [end tick of control changes / pitch bends])
+    stragglers = {}         # (channel, track) -> [end tick] of events before the first note
+    meta_ticks = []         # Ticks of the meta events counted by PrettyMIDI.get_end_time
+
+    for track_idx, events in enumerate(tracks):
+        track_name = ''
+        last_note_on = {}
+        current_program = [0] * 16
+        for tick, kind, a, b, c in events:
+            if kind == 'meta':
+                if a == 0x03:
+                    track_name = b.decode('latin1')
+                elif a in (0x05, 0x01) or (track_idx == 0 and a in (0x58, 0x59)):
+                    meta_ticks.append(tick)   # lyrics / text (all tracks), signatures (track 0)
+                continue
+            channel = a
+            if kind == 0xC:
+                current_program[channel] = b
+            elif kind == 0x9 and c > 0:
+                last_note_on.setdefault((channel, b), []).append((tick, c))
+            elif kind == 0x8 or kind == 0x9:
+                key = (channel, b)
+                if key not in last_note_on:
+                    continue
+                open_notes = last_note_on[key]
+                to_close = [(start, velocity) for start, velocity in open_notes if start != tick]
+                to_keep = [(start, velocity) for start, velocity in open_notes if start == tick]
+                for start, velocity in to_close:
+                    program = current_program[channel]
+                    inst_key = (program, channel, track_idx)
+                    if inst_key not in instrument_keys:
+                        cc_ticks = stragglers.get((channel, track_idx), [])
+                        instrument_keys[inst_key] = len(instruments)
+                        instruments.append((track_name, program, channel == 9, cc_ticks))
+                    rows.append((start, tick, b, velocity, program, track_idx, channel, instrument_keys[inst_key]))
+                if to_close and to_keep:
+                    last_note_on[key] = to_keep
+                else:
+                    del last_note_on[key]
+            elif kind in (0xB, 0xE):
+                inst_key = (current_program[channel], channel, track_idx)
+                if inst_key in instrument_keys:
+                    instruments[instrument_keys[inst_key]][3].append(tick)
+                else:
+                    stragglers.setdefault((channel, track_idx), []).append(tick)
+
+    notes = np.zeros(len(rows), dtype=NOTE_DTYPE)
+    if rows:
+        columns = np.array(rows, dtype=np.int64)
+        notes['start'] = _ticks_to_times(columns[:, 0], scales)
+        notes['end'] = _ticks_to_times(columns[:, 1], scales)
+        for k, field in enumerate(('pitch', 'velocity', 'program', 'track', 'channel', 'instrument'), start=2):
+            notes[field] = columns[:, k]
+        # Instrument by instrument, notes in their closing order (like Instrument.notes)
+        notes = notes[np.argsort(notes['instrument'], kind='stable')]
+
+    # PrettyMIDI.get_end_time: notes, control changes / pitch bends, meta events and tempo changes
+    end_ticks = [tick for _, _, _, cc_ticks in instruments for tick in cc_ticks] + meta_ticks + [t for t, _ in scales]
+    end_time = float(_ticks_to_times(end_ticks, scales).max())
+    if len(notes):
+        end_time = max(end_time, float(notes['end'].max()))
+
+    names = [name for name, _, _, _ in instruments]
+    programs = np.array([program for _, program, _, _ in instruments], dtype=np.int16)
+    is_drums = np.array([is_drum for _, _, is_drum, _ in instruments], dtype=bool)
+    return MidiNotes(notes, names, programs, is_drums, end_time)
+
+# -------------------- .npz cache --------------------
+def cache_path(path):
+    return f"{path}.npz"
+
+def _file_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+def _read_cache(path, stat):
+    """MidiNotes from the cache if it matches path, else None"""
+    cached = cache_path(path)
+    if not os.path.exists(cached):
+        return None
+    try:
+        with np.load(cached, allow_pickle=False) as archive:
+            if int(archive['version']) != CACHE_VERSION:
+                return None
+            same_stat = int(archive['size']) == stat.st_size and int(archive['mtime_ns']) == stat.st_mtime_ns
+            if not same_stat:
+                with open(path, 'rb') as f:
+                    if _file_hash(f.read()) != str(archive['sha1']):
+                        return None
+            return MidiNotes(archive['notes'], [str(name) for name in archive['names']], archive['programs'],
+                             archive['is_drums'], float(archive['end_time']))
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile) as e:
+        # Damaged cache (e.g. written by an older version without the atomic rename): parsed again and rewritten
+        logger.debug("Ignoring MIDI cache %s: %s", cached, e)
+        try:
+            os.remove(cached)
+        except OSError:
+            pass
+        return None
+
+def _write_cache(path, stat, midi):
+    with open(path, 'rb') as f:
+        sha1 = _file_hash(f.read())
+    names = np.array([inst.name for inst in midi.instruments], dtype=str)
+    programs = np.array([inst.program for inst in midi.instruments], dtype=np.int16)
+    is_drums = np.array([inst.is_drum for inst in midi.instruments], dtype=bool)
+    cached = cache_path(path)
+    # Written under a temporary name in the same directory: a concurrent reader never sees a half-written file
+    # (unique per call: the pipeline stages load MIDI files from several threads of one process)
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(cached) + '.', suffix='.tmp',
+                                        dir=os.path.dirname(cached) or '.')
+    except OSError as e:
+        logger.debug("Could not write MIDI cache for %s: %s", path, e)
+        return
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, version=CACHE_VERSION, size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha1=sha1,
+                     notes=midi.notes, names=names, programs=programs, is_drums=is_drums, end_time=midi.end_time)
+        os.replace(tmp_path, cached)
+    except OSError as e:
+        logger.debug("Could not write MIDI cache for %s: %s", path, e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def load_midi(path, use_cache=MIDI_NPZ_CACHE):
+    """MidiNotes of the MIDI file at path, from the .npz cache when it is up to date"""
+    stat = os.stat(path)
+    if use_cache:
+        midi = _read_cache(path, stat)
+        if midi is not None:
+            return midi
+    midi = parse_midi(path)
+    if use_cache:
+        _write_cache(path, stat, midi)
+    return midi
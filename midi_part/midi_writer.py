@@ -0,0 +1,24 @@
+"""
+Standard MIDI File building blocks shared by the writers that produce the
+bytes themselves (midi_combinator.merge_midis, Note.StreamingMidiWriter).
+"""
+import struct
+
+def encode_variable_length(value):
+    """Encode an integer as a MIDI variable-length quantity"""
+    result = [value & 0x7F]
+    value >>= 7
+    while value:
+        result.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(result))
+
+def header_chunk(track_count, ticks_per_beat, midi_format=1):
+    return b'MThd' + struct.pack('>IHHH', 6, midi_format, track_count, ticks_per_beat)
+
+def meta_event(meta_type, payload):
+    """Meta event without its delta time"""
+    return bytes((0xFF, meta_type)) + encode_variable_length(len(payload)) + payload
+
+def track_chunk(data):
+    return b'MTrk' + struct.pack('>I', len(data)) + bytes(data)
@@ -4,21 +4,34 @@ from scipy.signal import find_peaks
 import math
 
 from config import *
+from instrumentation import timed
 
 # -------------------- Conservative CQT-Based Note Detection with Trumpet Support --------------------
 
-def detect_notes_with_cqt_onsets(cqt_spectrum, cqt_frequencies, current_time, onset_times, max_notes=5):
+def detect_notes_with_cqt_onsets(cqt_spectrum, cqt_frequencies, current_time, onset_times, max_notes=5, funnel=None):
     """
     Balanced note detection that maintains conservative quality standards
     while adding targeted trumpet detection capabilities.
     
     Key principle: Only be more permissive when we have strong evidence
     that we're dealing with legitimate trumpet notes, not noise.
+
+    funnel: optional instrumentation.DetectionFunnel collecting per-frame counters.
     """
-    
+    if funnel is None:
+        return _detect_notes_with_cqt_onsets(cqt_spectrum, cqt_frequencies, current_time, onset_times, max_notes, None)
+
+    funnel.begin_frame(current_time, cqt_spectrum, cqt_frequencies)
+    try:
+        return _detect_notes_with_cqt_onsets(cqt_spectrum, cqt_frequencies, current_time, onset_times, max_notes, funnel)
+    finally:
+        funnel.end_frame()
+
+def _detect_notes_with_cqt_onsets(cqt_spectrum, cqt_frequencies, current_time, onset_times, max_notes, funnel):
     # Check if we're near an onset - but be more selective about what constitutes "near"
-    near_onset = any(abs(current_time - onset_time) < 0.05 for onset_time in onset_times)
-    very_near_onset = any(abs(current_time - onset_time) < 0.02 for onset_time in onset_times)
+    with timed(funnel, 'onset_proximity'):
+        near_onset = any(abs(current_time - onset_time) < 0.05 for onset_time in onset_times)
+        very_near_onset = any(abs(current_time - onset_time) < 0.02 for onset_time in onset_times)
     
     # Use the original conservative parameters as baseline
     base_min_height = MIN_PEAK_HEIGHT
@@ -39,61 +52,81 @@ def detect_notes_with_cqt_onsets(cqt_spectrum, cqt_frequencies, current_time, on
         onset_boost = 1.0
     
     # Find peaks with conservative parameters
-    peak_freqs, peak_mags, peak_indices = find_cqt_peaks_conservative(
-        cqt_spectrum, cqt_frequencies, min_height=adjusted_min_height
-    )
+    with timed(funnel, 'find_cqt_peaks_conservative'):
+        peak_freqs, peak_mags, peak_indices = find_cqt_peaks_conservative(
+            cqt_spectrum, cqt_frequencies, min_height=adjusted_min_height, funnel=funnel
+        )
     
     if len(peak_freqs) == 0:
         return []
     
     # Group harmonics with stricter quality requirements
-    fundamentals = group_cqt_harmonics_conservative(peak_freqs, peak_mags, cqt_frequencies)
+    with timed(funnel, 'group_cqt_harmonics_conservative'):
+        fundamentals = group_cqt_harmonics_conservative(peak_freqs, peak_mags, cqt_frequencies)
     
     # Only proceed with high-quality fundamental candidates
     high_quality_fundamentals = []
-    for fundamental_data in fundamentals:
-        f0, energy, num_harmonics, harmonic_strength, matched_instrument, pattern_score = fundamental_data
-        
-        # Strict quality gate - must meet multiple criteria
-        passes_quality_check = evaluate_detection_quality(
-            f0, energy, num_harmonics, harmonic_strength, pattern_score, adjusted_threshold
-        )
-        
-        if passes_quality_check:
-            high_quality_fundamentals.append(fundamental_data)
+    with timed(funnel, 'evaluate_detection_quality'):
+        for fundamental_data in fundamentals:
+            f0, energy, num_harmonics, harmonic_strength, matched_instrument, pattern_score = fundamental_data
+            
+            # Strict quality gate - must meet multiple criteria
+            failed_rule = failed_quality_rule(
+                f0, energy, num_harmonics, harmonic_strength, pattern_score, adjusted_threshold
+            )
+            
+            if failed_rule == 0:
+                high_quality_fundamentals.append(fundamental_data)
+            elif funnel is not None:
+                funnel.reject(failed_rule)
+
+    if funnel is not None:
+        funnel.count('fundamental_candidates', len(fundamentals))
+        funnel.count('accepted', len(high_quality_fundamentals))
     
     # Convert only high-quality detections to notes
     detected_notes = []
-    centroid, rolloff, flatness = compute_timbre_features_conservative(cqt_spectrum, cqt_frequencies)
-    
-    for f0, energy, num_harmonics, harmonic_strength, matched_instrument, pattern_score in high_quality_fundamentals:
-        try:
-            # Conservative confidence calculation - no excessive bonuses
-            confidence = calculate_conservative_confidence(
-                energy, num_harmonics, harmonic_strength, pattern_score, onset_boost
-            )
+    with timed(funnel, 'compute_timbre_features_conservative'):
+        centroid, rolloff, flatness = compute_timbre_features_conservative(cqt_spectrum, cqt_frequencies)
+    
+    with timed(funnel, 'classify_and_convert'):
+        for f0, energy, num_harmonics, harmonic_strength, matched_instrument, pattern_score in high_quality_fundamentals:
+            try:
+                # Conservative confidence calculation - no excessive bonuses
+                confidence = calculate_conservative_confidence(
+                    energy, num_harmonics, harmonic_strength, pattern_score, onset_boost
+                )
             
-            # Conservative instrument classification
-            is_piano = classify_instrument_conservative(
-                f0, confidence, num_harmonics, pattern_score,
-                centroid, rolloff, flatness, matched_instrument
-            )
+                # Conservative instrument classification
+                is_piano = classify_instrument_conservative(
+                    f0, confidence, num_harmonics, pattern_score,
+                    centroid, rolloff, flatness, matched_instrument
+                )
             
-            # Convert to musical note
-            midi = librosa.hz_to_midi(f0)
-            note_name = librosa.midi_to_note(midi, octave=True)
+                # Convert to musical note
+                midi = librosa.hz_to_midi(f0)
+                note_name = librosa.midi_to_note(midi, octave=True)
             
-            detected_notes.append((f0, confidence, note_name, is_piano))
+                detected_notes.append((f0, confidence, note_name, is_piano))
             
-        except Exception as e:
-            continue
+            except Exception as e:
+                continue
     
     # Aggressive duplicate removal - be very strict about what constitutes different notes
-    detected_notes = remove_duplicate_notes_strict(detected_notes)
+    converted_count = len(detected_notes)
+    with timed(funnel, 'remove_duplicate_notes_strict'):
+        detected_notes = remove_duplicate_notes_strict(detected_notes)
+
+    if funnel is not None:
+        funnel.count('duplicates_removed', converted_count - len(detected_notes))
     
     # Sort by confidence and limit to reasonable number
     detected_notes.sort(key=lambda x: x[1], reverse=True)
-    return detected_notes[:min(max_notes, 4)]  # Cap at 4 simultaneous notes max
+    detected_notes = detected_notes[:min(max_notes, 4)]  # Cap at 4 simultaneous notes max
+
+    if funnel is not None:
+        funnel.count('detected', len(detected_notes))
+    return detected_notes
 
 def evaluate_detection_quality(f0, energy, num_harmonics, harmonic_strength, pattern_score, threshold):
     """
@@ -101,38 +134,44 @@ def evaluate_detection_quality(f0, energy, num_harmonics, harmonic_strength, pat
     
     This is the key function that prevents false positives while allowing trumpet notes.
     """
+    return failed_quality_rule(f0, energy, num_harmonics, harmonic_strength, pattern_score, threshold) == 0
+
+def failed_quality_rule(f0, energy, num_harmonics, harmonic_strength, pattern_score, threshold):
+    """
+    Number of the first rule of evaluate_detection_quality that rejects the detection, 0 if accepted.
+    """
     
     # Rule 1: Must meet energy threshold
     if energy < threshold:
-        return False
+        return 1
     
     # Rule 2: Must have either strong harmonics OR very high energy
     if num_harmonics < 2 and energy < threshold * 2.0:
-        return False
+        return 2
     
     # Rule 3: Harmonic strength must be reasonable
     if harmonic_strength < 0.4:
-        return False
+        return 3
     
     # Rule 4: Must be in reasonable musical frequency range
     if f0 < 70 or f0 > 2000:  # Slightly extended for trumpet but not too much
-        return False
+        return 4
     
     # Rule 5: Pattern score should indicate some instrument-like behavior
     if pattern_score < 0.3:
-        return False
+        return 5
     
     # Rule 6: Very high frequency detections need extra evidence
     if f0 > 1500 and (num_harmonics < 3 or energy < threshold * 1.5):
-        return False
+        return 6
     
     # Rule 7: Very low frequency detections need strong harmonic support  
     if f0 < 100 and (num_harmonics < 3 or harmonic_strength < 0.6):
-        return False
+        return 7
     
-    return True
+    return 0
 
-def find_cqt_peaks_conservative(cqt_spectrum, cqt_frequencies, min_height=MIN_PEAK_HEIGHT):
+def find_cqt_peaks_conservative(cqt_spectrum, cqt_frequencies, min_height=MIN_PEAK_HEIGHT, funnel=None):
     """
     Conservative peak finding that maintains original quality standards
     while being slightly more aware of trumpet characteristics.
@@ -155,6 +194,9 @@ def find_cqt_peaks_conservative(cqt_spectrum, cqt_frequencies, min_height=MIN_PE
         width=1.0,           # Require minimum width
         rel_height=0.8       # Require good peak shape
     )
+
+    if funnel is not None:
+        funnel.count('raw_peaks', len(peaks))
     
     if len(peaks) == 0:
         return [], [], []
@@ -194,6 +236,9 @@ def find_cqt_peaks_conservative(cqt_spectrum, cqt_frequencies, min_height=MIN_PE
             filtered_mags.append(mag)
             filtered_indices.append(idx)
     
+    if funnel is not None:
+        funnel.count('supported_peaks', len(filtered_peaks))
+
     if len(filtered_peaks) > 0:
         # Sort by magnitude (strongest first)
         sort_idx = np.argsort(filtered_mags)[::-1]
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import config
+from Utils.log_utils import get_logger
+
+logger = get_logger('pipeline')
+
+# -------------------- Cached stage runner --------------------
+# A stage declares the files it reads (inputs), the files it writes (outputs) and
+# the config values it depends on. Its cache key is the hash of the inputs'
+# content and of those values: when the key and the outputs' content match the
+# last run, the stage is skipped. Stages without outputs produce an in-memory
+# result (pipeline.results[name]) and always run.
+# Stages whose inputs are ready run concurrently in threads; a stage alone runs
+# in the calling thread (matplotlib/pygame expect the main thread).
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def config_values(names=None, exclude=()):
+    """Upper-case settings of config.py (only names when given), minus the excluded names"""
+    if names is None:
+        names = [name for name in dir(config) if name.isupper()]
+    return {name: getattr(config, name) for name in names if name not in exclude}
+
+class Stage:
+    def __init__(self, name, func, inputs=(), outputs=(), config=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.config = config or {}
+
+    def cache_key(self):
+        digest = hashlib.sha256(self.name.encode())
+        for path in self.inputs:
+            digest.update(path.encode())
+            digest.update(file_hash(path).encode())
+        digest.update(json.dumps(self.config, sort_keys=True, default=repr).encode())
+        return digest.hexdigest()
+
+class Pipeline:
+    def __init__(self, cache_file, max_workers=4):
+        self.cache_file = cache_file
+        self.max_workers = max_workers
+        self.stages = {}
+        self.results = {}
+        self.cache = self._load_cache()
+        self.lock = threading.Lock()
+
+    def add(self, stage):
+        self.stages[stage.name] = stage
+        return stage
+
+    def _load_cache(self):
+        """Last run of each stage, empty (every stage reruns) if the cache is missing or unreadable"""
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file) as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable pipeline cache %s: %s", self.cache_file, e)
+            return {}
+        return cache if isinstance(cache, dict) else {}
+
+    def _save_cache(self):
+        """Atomic write (called under self.lock) so an interrupted run never leaves a truncated cache"""
+        directory = os.path.dirname(self.cache_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.cache_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.cache, f, indent=2)
+        os.replace(tmp_path, self.cache_file)
+
+    def dependencies(self, stage):
+        """Stages producing one of the inputs of stage"""
+        producers = {path: other.name for other in self.stages.values() for path in other.outputs}
+        return {producers[path] for path in stage.inputs if path in producers}
+
+    def is_up_to_date(self, stage, key):
+        entry = self.cache.get(stage.name)
+        if not stage.outputs or entry is None or entry['key'] != key:
+            return False
+        for path in stage.outputs:
+            if not os.path.exists(path) or entry['outputs'].get(path) != file_hash(path):
+                return False
+        return True
+
+    def _run_stage(self, stage, force):
+        key = stage.cache_key()
+        if not force and self.is_up_to_date(stage, key):
+            logger.info("[%s] up to date, skipped", stage.name)
+            return 'skipped'
+
+        logger.info("[%s] running...", stage.name)
+        start = time.perf_counter()
+        self.results[stage.name] = stage.func()
+        elapsed = time.perf_counter() - start
+
+        missing = [path for path in stage.outputs if not os.path.exists(path)]
+        if missing:
+            raise RuntimeError(f"Stage {stage.name} did not write {', '.join(missing)}")
+        if stage.outputs:
+            with self.lock:
+                self.cache[stage.name] = {
+                    'key': key,
+                    'outputs': {path: file_hash(path) for path in stage.outputs},
+                    'wall_s': elapsed,
+                    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                }
+                self._save_cache()
+        logger.info("[%s] done in %.2fs", stage.name, elapsed)
+        return 'ran'
+
+    def run(self, force=()):
+        """
+        Runs every stage in dependency order, force is a list of stage names to
+        run even when up to date. Returns {stage name: 'ran' | 'skipped' | 'failed' | 'blocked'}.
+        """
+        deps = {name: self.dependencies(stage) for name, stage in self.stages.items()}
+        status = {}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while len(status) < len(self.stages):
+                for name, stage in self.stages.items():
+                    if name in status or name in running.values():
+                        continue
+                    if any(status.get(dep) in ('failed', 'blocked') for dep in deps[name]):
+                        status[name] = 'blocked'
+                        logger.error("[%s] not run, an upstream stage failed", name)
+                        continue
+                    if not all(dep in status for dep in deps[name]):
+                        continue
+                    ready = [other for other in self.stages
+                             if other not in status and other not in running.values()
+                             and all(dep in status for dep in deps[other])]
+                    if len(ready) == 1 and not running:
+                        status[name] = self._run_inline(stage, name in force)
+                    else:
+                        running[executor.submit(self._run_stage, stage, name in force)] = name
+
+                if not running:
+                    if len(status) < len(self.stages) and not any(
+                            all(dep in status for dep in deps[name]) for name in self.stages if name not in status):
+                        # Circular inputs / outputs: nothing can start anymore
+                        for name in self.stages:
+                            status.setdefault(name, 'blocked')
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        status[name] = future.result()
+                    except Exception as e:
+                        status[name] = 'failed'
+                        logger.error("[%s] failed: %s", name, e)
+        return status
+
+    def _run_inline(self, stage, force):
+        try:
+            return self._run_stage(stage, force)
+        except Exception as e:
+            logger.error("[%s] failed: %s", stage.name, e)
+            return 'failed'
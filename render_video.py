@@ -0,0 +1,159 @@
+"""
+Offline render of the animation: numbered frames and a WAV, no window, no clock.
+
+    python render_video.py Sounds/Gamme.mp3 Output/detected_notesboth.mid --out Output/render
+    python render_video.py Sounds/SSB.mp3 Sounds/SSB.mid --out Output/ssb --format raw --workers 8 --seed 3
+
+Frames are rendered headless (SDL dummy video driver) on a fixed timestep of
+1 / FPS, from the start of the music until the moment the live animation
+restarts. The random module is seeded again at every frame from (seed, frame),
+so the frame k is the same whatever process renders it: the timeline is split
+into one segment per worker, and each worker fast-forwards the simulation to the
+start of its segment (no Earth / Moon colouring, no pure draws) before rendering.
+
+The output directory gets frame_000000.png... (or .rgb files, raw 8-bit RGB rows
+of the frame size), audio.wav and render.json. To encode a video:
+    ffmpeg -framerate 30 -i Output/render/frame_%06d.png -i Output/render/audio.wav -pix_fmt yuv420p out.mp4
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from config import FPS, RENDER_SEED
+
+FRAME_FORMATS = ("png", "raw")
+
+def frame_seed(seed, frame):
+    """Seed of the random module for a frame, frame -1 being the setup (init_simu)"""
+    return seed * 1_000_003 + frame + 1
+
+def frame_time(frame, fps=FPS):
+    return frame / fps
+
+def frame_count(music_length_ms, fps=FPS):
+    """Frames up to and including the one where the live animation restarts (music end + 1s)"""
+    return math.ceil((music_length_ms + 1000) / 1000 * fps) + 1
+
+def frame_path(out_dir, frame, frame_format):
+    return os.path.join(out_dir, f"frame_{frame:06d}.{'png' if frame_format == 'png' else 'rgb'}")
+
+def split_segments(frames, segments):
+    """[(first, last)] contiguous frame ranges, last excluded"""
+    segments = max(1, min(segments, frames))
+    bounds = [frames * i // segments for i in range(segments + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(segments)]
+
+def _init_headless():
+    # Before pygame is imported by the animation modules
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+def render_segment(mp3, midi, seed, first, last, out_dir, frame_format):
+    """Renders the frames first..last-1, returns (first, last, fast-forward s, render s, frame size)"""
+    _init_headless()
+    import logging
+    import pygame
+    import animation
+    logging.getLogger('musicsync').setLevel(logging.WARNING)
+
+    pygame.display.init()
+    animation.load_simulation(mp3, midi, animation.prepare_animation(midi))
+    random.seed(frame_seed(seed, -1))
+    animation.init_simu(play_music=False)
+
+    screen = pygame.Surface((animation.width, animation.height))
+    null_screen = pygame.Surface((1, 1))  # Draws of the fast-forward land here
+
+    start = time.perf_counter()
+    for frame in range(first):
+        random.seed(frame_seed(seed, frame))
+        animation.step_frame(null_screen, frame_time(frame), render=False)
+    fast_forward_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for frame in range(first, last):
+        random.seed(frame_seed(seed, frame))
+        animation.step_frame(screen, frame_time(frame))
+        path = frame_path(out_dir, frame, frame_format)
+        if frame_format == "png":
+            pygame.image.save(screen, path)
+        else:
+            with open(path, 'wb') as f:
+                f.write(pygame.image.tobytes(screen, "RGB"))
+    render_s = time.perf_counter() - start
+
+    pygame.quit()
+    return first, last, fast_forward_s, render_s, screen.get_size()
+
+def write_audio(mp3, path):
+    import librosa
+    import soundfile
+    y, sr = librosa.load(mp3, sr=None, mono=False)
+    soundfile.write(path, y.T if y.ndim > 1 else y, sr)
+    return sr
+
+def render(mp3, midi, out_dir, workers, seed=RENDER_SEED, frame_format="png", max_frames=None):
+    """Renders every frame and the WAV into out_dir, returns the render.json content"""
+    from midi_part.midi_loader import load_midi
+
+    os.makedirs(out_dir, exist_ok=True)
+    music_length = load_midi(midi).get_end_time() * 1000
+    frames = frame_count(music_length)
+    if max_frames is not None:
+        frames = min(frames, max_frames)
+    segments = split_segments(frames, workers)
+
+    start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(len(segments)) as pool:
+        pending = pool.starmap_async(render_segment, [(mp3, midi, seed, first, last, out_dir, frame_format)
+                                                      for first, last in segments])
+        sample_rate = write_audio(mp3, os.path.join(out_dir, "audio.wav"))  # While the workers render
+        results = pending.get()
+    wall_s = time.perf_counter() - start
+
+    info = {
+        'mp3': mp3,
+        'midi': midi,
+        'seed': seed,
+        'fps': FPS,
+        'frames': frames,
+        'format': frame_format,
+        'size': list(results[0][4]),
+        'sample_rate': sample_rate,
+        'duration_s': frames / FPS,
+        'wall_s': wall_s,
+        'segments': [{'first': first, 'last': last, 'fast_forward_s': ff, 'render_s': render_s}
+                     for first, last, ff, render_s, _ in results],
+    }
+    with open(os.path.join(out_dir, "render.json"), 'w') as f:
+        json.dump(info, f, indent=2)
+    return info
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the animation offline to numbered frames and a WAV")
+    parser.add_argument("mp3", help="Audio file played by the animation")
+    parser.add_argument("midi", help="MIDI file driving the animation")
+    parser.add_argument("--out", default="Output/render", help="Output directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Render processes (one segment each)")
+    parser.add_argument("--seed", type=int, default=RENDER_SEED, help="Random seed, same seed = same frames")
+    parser.add_argument("--format", choices=FRAME_FORMATS, default="png", help="png frames or raw RGB frames")
+    parser.add_argument("--max-frames", type=int, help="Only the first frames (quick preview)")
+    args = parser.parse_args(argv)
+
+    info = render(args.mp3, args.midi, args.out, args.workers, args.seed, args.format, args.max_frames)
+    print(f"{info['frames']} frames ({info['duration_s']:.1f}s at {FPS} FPS) in {info['wall_s']:.1f}s "
+          f"with {len(info['segments'])} worker(s), {info['duration_s'] / max(info['wall_s'], 1e-9):.2f}x real time")
+    for segment in info['segments']:
+        print(f"  frames {segment['first']:>6d}-{segment['last'] - 1:<6d} fast-forward {segment['fast_forward_s']:6.1f}s, "
+              f"render {segment['render_s']:6.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())